@@ -1,9 +1,23 @@
-import requests
+import httpx
+import asyncio
+import os
 import sys
 import json
 from datetime import datetime
+from pathlib import Path
 import base64
-import io
+
+try:
+    from orjson import loads as json_loads
+except ImportError:  # stdlib fallback; orjson decodes bytes directly and faster
+    json_loads = json.loads
+
+# 1x1 pixel PNG used for upload tests, decoded once
+TEST_PNG_BYTES = base64.b64decode(b'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChAGA60e6kgAAAABJRU5ErkJggg==')
+
+# Tokens from earlier runs, keyed by "<base_url> <username>"; reused while
+# the server still accepts them so iterative runs skip the login round trip
+TOKEN_CACHE_PATH = Path(os.environ.get("VCC_TEST_TOKEN_CACHE", Path.home() / ".vcc_test_tokens.json"))
 
 class VehicleConspicuityAPITester:
     def __init__(self, base_url="https://retail-chain.preview.emergentagent.com/api"):
@@ -17,68 +31,66 @@ class VehicleConspicuityAPITester:
         self.tests_run = 0
         self.tests_passed = 0
         self.failed_tests = []
+        # Shared HTTP/2 client, opened by main() for the whole run
+        self.client = None
 
-    def run_test(self, name, method, endpoint, expected_status, data=None, token=None, files=None):
+    async def run_test(self, name, method, endpoint, expected_status, data=None, token=None, files=None, parse_response=True):
         """Run a single API test"""
-        url = f"{self.base_url}/{endpoint}"
-        headers = {'Content-Type': 'application/json'}
+        headers = {}
         
         if token:
             headers['Authorization'] = f'Bearer {token}'
-        
-        if files:
-            # Remove Content-Type for file uploads
-            headers.pop('Content-Type', None)
 
         self.tests_run += 1
         print(f"\n🔍 Testing {name}...")
         
         try:
-            if method == 'GET':
-                response = requests.get(url, headers=headers)
-            elif method == 'POST':
-                if files:
-                    response = requests.post(url, files=files, headers=headers)
-                else:
-                    response = requests.post(url, json=data, headers=headers)
-            elif method == 'PUT':
-                response = requests.put(url, json=data, headers=headers)
-            elif method == 'DELETE':
-                response = requests.delete(url, headers=headers)
+            response = await self.client.request(
+                method,
+                endpoint,
+                headers=headers,
+                json=data if files is None else None,
+                files=files,
+            )
+            body = response.content
 
             success = response.status_code == expected_status
             if success:
                 self.tests_passed += 1
                 print(f"✅ Passed - Status: {response.status_code}")
-                try:
-                    return success, response.json() if response.content else {}
-                except:
-                    return success, {}
             else:
                 print(f"❌ Failed - Expected {expected_status}, got {response.status_code}")
                 print(f"   Response: {response.text[:200]}...")
-                self.failed_tests.append({
+                self.record_failure({
                     "test": name,
                     "expected": expected_status,
                     "actual": response.status_code,
                     "response": response.text[:200]
                 })
-                try:
-                    return False, response.json() if response.content else {}
-                except:
-                    return False, {}
+            # Skip decoding when the caller discards the body or it is not JSON
+            if not parse_response:
+                return success, None
+            if not body or not response.headers.get("content-type", "").startswith("application/json"):
+                return success, {}
+            try:
+                return success, json_loads(body)
+            except ValueError:
+                return success, {}
 
         except Exception as e:
             print(f"❌ Failed - Error: {str(e)}")
-            self.failed_tests.append({
+            self.record_failure({
                 "test": name,
                 "error": str(e)
             })
             return False, {}
 
-    def test_root_endpoint(self):
+    def record_failure(self, failure):
+        self.failed_tests.append(failure)
+
+    async def test_root_endpoint(self):
         """Test root API endpoint"""
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Root API Endpoint",
             "GET",
             "",
@@ -86,9 +98,39 @@ class VehicleConspicuityAPITester:
         )
         return success
 
-    def test_admin_login(self):
+    def load_cached_token(self, username):
+        try:
+            cache = json.loads(TOKEN_CACHE_PATH.read_text())
+        except (OSError, ValueError):
+            return None
+        return cache.get(f"{self.base_url} {username}")
+
+    def store_cached_token(self, username, token):
+        try:
+            cache = json.loads(TOKEN_CACHE_PATH.read_text())
+        except (OSError, ValueError):
+            cache = {}
+        cache[f"{self.base_url} {username}"] = token
+        TOKEN_CACHE_PATH.write_text(json.dumps(cache))
+        TOKEN_CACHE_PATH.chmod(0o600)
+
+    async def token_is_valid(self, token):
+        """Untracked auth/me probe used to vet a cached token"""
+        try:
+            response = await self.client.get("auth/me", headers={'Authorization': f'Bearer {token}'})
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 200
+
+    async def test_admin_login(self):
         """Test admin login with default credentials"""
-        success, response = self.run_test(
+        cached_token = self.load_cached_token("admin")
+        if cached_token and await self.token_is_valid(cached_token):
+            self.admin_token = cached_token
+            print(f"   Reusing cached admin token: {self.admin_token[:20]}...")
+            return True
+
+        success, response = await self.run_test(
             "Admin Login",
             "POST",
             "auth/login",
@@ -98,16 +140,17 @@ class VehicleConspicuityAPITester:
         if success and 'access_token' in response:
             self.admin_token = response['access_token']
             print(f"   Admin token obtained: {self.admin_token[:20]}...")
+            self.store_cached_token("admin", self.admin_token)
             return True
         return False
 
-    def test_admin_dashboard_stats(self):
+    async def test_admin_dashboard_stats(self):
         """Test admin dashboard stats"""
         if not self.admin_token:
             print("❌ Skipping - No admin token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Admin Dashboard Stats",
             "GET",
             "dashboard/stats",
@@ -121,7 +164,7 @@ class VehicleConspicuityAPITester:
                     print(f"   Warning: Missing key '{key}' in stats response")
         return success
 
-    def test_create_distributor(self):
+    async def test_create_distributor(self):
         """Test creating a distributor user"""
         if not self.admin_token:
             print("❌ Skipping - No admin token")
@@ -136,7 +179,7 @@ class VehicleConspicuityAPITester:
             "contact_number": "1234567890"
         }
         
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Create Distributor",
             "POST",
             "auth/register",
@@ -149,7 +192,7 @@ class VehicleConspicuityAPITester:
             print(f"   Distributor created with ID: {self.distributor_id}")
             
             # Test distributor login
-            login_success, login_response = self.run_test(
+            login_success, login_response = await self.run_test(
                 "Distributor Login",
                 "POST",
                 "auth/login",
@@ -162,7 +205,7 @@ class VehicleConspicuityAPITester:
             return True
         return False
 
-    def test_create_retailer(self):
+    async def test_create_retailer(self):
         """Test creating a retailer user by distributor"""
         if not self.distributor_token:
             print("❌ Skipping - No distributor token")
@@ -177,7 +220,7 @@ class VehicleConspicuityAPITester:
             "contact_number": "9876543210"
         }
         
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Create Retailer by Distributor",
             "POST",
             "auth/register",
@@ -190,7 +233,7 @@ class VehicleConspicuityAPITester:
             print(f"   Retailer created with ID: {self.retailer_id}")
             
             # Test retailer login
-            login_success, login_response = self.run_test(
+            login_success, login_response = await self.run_test(
                 "Retailer Login",
                 "POST",
                 "auth/login",
@@ -203,13 +246,13 @@ class VehicleConspicuityAPITester:
             return True
         return False
 
-    def test_distributor_dashboard_stats(self):
+    async def test_distributor_dashboard_stats(self):
         """Test distributor dashboard stats"""
         if not self.distributor_token:
             print("❌ Skipping - No distributor token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Distributor Dashboard Stats",
             "GET",
             "dashboard/stats",
@@ -223,13 +266,13 @@ class VehicleConspicuityAPITester:
                     print(f"   Warning: Missing key '{key}' in distributor stats response")
         return success
 
-    def test_retailer_dashboard_stats(self):
+    async def test_retailer_dashboard_stats(self):
         """Test retailer dashboard stats"""
         if not self.retailer_token:
             print("❌ Skipping - No retailer token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Retailer Dashboard Stats",
             "GET",
             "dashboard/stats",
@@ -243,13 +286,13 @@ class VehicleConspicuityAPITester:
                     print(f"   Warning: Missing key '{key}' in retailer stats response")
         return success
 
-    def test_get_users_admin(self):
+    async def test_get_users_admin(self):
         """Test getting all users as admin"""
         if not self.admin_token:
             print("❌ Skipping - No admin token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get All Users (Admin)",
             "GET",
             "users",
@@ -260,13 +303,13 @@ class VehicleConspicuityAPITester:
             print(f"   Found {len(response)} users")
         return success
 
-    def test_get_users_distributor(self):
+    async def test_get_users_distributor(self):
         """Test getting retailers as distributor"""
         if not self.distributor_token:
             print("❌ Skipping - No distributor token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get Retailers (Distributor)",
             "GET",
             "users",
@@ -277,7 +320,7 @@ class VehicleConspicuityAPITester:
             print(f"   Found {len(response)} retailers under distributor")
         return success
 
-    def test_create_certificate(self):
+    async def test_create_certificate(self):
         """Test creating a certificate as retailer"""
         if not self.retailer_token:
             print("❌ Skipping - No retailer token")
@@ -311,7 +354,7 @@ class VehicleConspicuityAPITester:
             "status": "draft"
         }
         
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Create Certificate (Draft)",
             "POST",
             "certificates",
@@ -326,13 +369,13 @@ class VehicleConspicuityAPITester:
             return True
         return False
 
-    def test_get_certificates_retailer(self):
+    async def test_get_certificates_retailer(self):
         """Test getting certificates as retailer"""
         if not self.retailer_token:
             print("❌ Skipping - No retailer token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get Certificates (Retailer)",
             "GET",
             "certificates",
@@ -343,13 +386,13 @@ class VehicleConspicuityAPITester:
             print(f"   Found {len(response)} certificates for retailer")
         return success
 
-    def test_get_certificate_by_id(self):
+    async def test_get_certificate_by_id(self):
         """Test getting specific certificate by ID"""
         if not self.certificate_id or not self.retailer_token:
             print("❌ Skipping - No certificate ID or retailer token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get Certificate by ID",
             "GET",
             f"certificates/{self.certificate_id}",
@@ -360,7 +403,7 @@ class VehicleConspicuityAPITester:
             print(f"   Retrieved certificate: {response.get('certificate_no', 'N/A')}")
         return success
 
-    def test_update_certificate(self):
+    async def test_update_certificate(self):
         """Test updating certificate"""
         if not self.certificate_id or not self.retailer_token:
             print("❌ Skipping - No certificate ID or retailer token")
@@ -371,7 +414,7 @@ class VehicleConspicuityAPITester:
             "status": "submitted"
         }
         
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Update Certificate",
             "PUT",
             f"certificates/{self.certificate_id}",
@@ -383,20 +426,17 @@ class VehicleConspicuityAPITester:
             print(f"   Certificate updated - Status: {response.get('status', 'N/A')}")
         return success
 
-    def test_image_upload(self):
+    async def test_image_upload(self):
         """Test image upload for certificate"""
         if not self.certificate_id or not self.retailer_token:
             print("❌ Skipping - No certificate ID or retailer token")
             return False
             
-        # Create a simple test image (1x1 pixel PNG)
-        test_image_data = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChAGA60e6kgAAAABJRU5ErkJggg==')
-        
         files = {
-            'file': ('test_image.png', io.BytesIO(test_image_data), 'image/png')
+            'file': ('test_image.png', TEST_PNG_BYTES, 'image/png')
         }
         
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Upload Certificate Image",
             "POST",
             f"certificates/{self.certificate_id}/upload-image?image_type=front",
@@ -408,13 +448,13 @@ class VehicleConspicuityAPITester:
             print(f"   Image uploaded successfully: {response.get('message', 'N/A')}")
         return success
 
-    def test_get_certificates_distributor(self):
+    async def test_get_certificates_distributor(self):
         """Test getting certificates as distributor"""
         if not self.distributor_token:
             print("❌ Skipping - No distributor token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get Certificates (Distributor)",
             "GET",
             "certificates",
@@ -425,13 +465,13 @@ class VehicleConspicuityAPITester:
             print(f"   Found {len(response)} certificates for distributor")
         return success
 
-    def test_get_certificates_admin(self):
+    async def test_get_certificates_admin(self):
         """Test getting all certificates as admin"""
         if not self.admin_token:
             print("❌ Skipping - No admin token")
             return False
             
-        success, response = self.run_test(
+        success, response = await self.run_test(
             "Get All Certificates (Admin)",
             "GET",
             "certificates",
@@ -442,58 +482,46 @@ class VehicleConspicuityAPITester:
             print(f"   Found {len(response)} total certificates")
         return success
 
-    def test_auth_me_endpoint(self):
+    async def test_auth_me_endpoint(self):
         """Test the /auth/me endpoint for all user types"""
-        results = []
+        probes = [
+            ("Admin", self.admin_token),
+            ("Distributor", self.distributor_token),
+            ("Retailer", self.retailer_token),
+        ]
+        probes = [(label, token) for label, token in probes if token]
         
-        if self.admin_token:
-            success, response = self.run_test(
-                "Get Current User Info (Admin)",
+        # Fired together: the requests share one multiplexed HTTP/2 connection
+        outcomes = await asyncio.gather(*(
+            self.run_test(
+                f"Get Current User Info ({label})",
                 "GET",
                 "auth/me",
                 200,
-                token=self.admin_token
+                token=token
             )
-            results.append(success)
-            if success:
-                print(f"   Admin user: {response.get('username', 'N/A')} - Role: {response.get('role', 'N/A')}")
+            for label, token in probes
+        ))
         
-        if self.distributor_token:
-            success, response = self.run_test(
-                "Get Current User Info (Distributor)",
-                "GET",
-                "auth/me",
-                200,
-                token=self.distributor_token
-            )
-            results.append(success)
-            if success:
-                print(f"   Distributor user: {response.get('username', 'N/A')} - Role: {response.get('role', 'N/A')}")
-        
-        if self.retailer_token:
-            success, response = self.run_test(
-                "Get Current User Info (Retailer)",
-                "GET",
-                "auth/me",
-                200,
-                token=self.retailer_token
-            )
+        results = []
+        for (label, _), (success, response) in zip(probes, outcomes):
             results.append(success)
             if success:
-                print(f"   Retailer user: {response.get('username', 'N/A')} - Role: {response.get('role', 'N/A')}")
+                print(f"   {label} user: {response.get('username', 'N/A')} - Role: {response.get('role', 'N/A')}")
         
         return all(results) if results else False
 
-    def test_unauthorized_access(self):
+    async def test_unauthorized_access(self):
         """Test unauthorized access scenarios"""
         print("\n🔒 Testing unauthorized access scenarios...")
         
         # Test accessing protected endpoint without token
-        success, _ = self.run_test(
+        success, _ = await self.run_test(
             "Access Dashboard Without Token",
             "GET",
             "dashboard/stats",
-            401
+            401,
+            parse_response=False
         )
         
         # Test retailer trying to create another user (should fail)
@@ -505,59 +533,80 @@ class VehicleConspicuityAPITester:
                 "company_name": "Unauthorized Co"
             }
             
-            success2, _ = self.run_test(
+            success2, _ = await self.run_test(
                 "Retailer Trying to Create User (Should Fail)",
                 "POST",
                 "auth/register",
                 403,
                 data=retailer_create_user,
-                token=self.retailer_token
+                token=self.retailer_token,
+                parse_response=False
             )
             return success and success2
         
         return success
 
-def main():
+async def main():
     print("🚀 Starting Vehicle Conspicuity Management System API Tests")
     print("=" * 60)
     
     tester = VehicleConspicuityAPITester()
-    
-    # Test sequence
-    test_sequence = [
-        ("Root Endpoint", tester.test_root_endpoint),
-        ("Admin Authentication", tester.test_admin_login),
-        ("Admin Dashboard Stats", tester.test_admin_dashboard_stats),
-        ("Create Distributor", tester.test_create_distributor),
-        ("Create Retailer", tester.test_create_retailer),
-        ("Distributor Dashboard Stats", tester.test_distributor_dashboard_stats),
-        ("Retailer Dashboard Stats", tester.test_retailer_dashboard_stats),
-        ("Get Users (Admin)", tester.test_get_users_admin),
-        ("Get Users (Distributor)", tester.test_get_users_distributor),
-        ("Create Certificate", tester.test_create_certificate),
-        ("Get Certificates (Retailer)", tester.test_get_certificates_retailer),
-        ("Get Certificate by ID", tester.test_get_certificate_by_id),
-        ("Update Certificate", tester.test_update_certificate),
-        ("Upload Certificate Image", tester.test_image_upload),
-        ("Get Certificates (Distributor)", tester.test_get_certificates_distributor),
-        ("Get Certificates (Admin)", tester.test_get_certificates_admin),
-        ("Auth Me Endpoints", tester.test_auth_me_endpoint),
-        ("Unauthorized Access", tester.test_unauthorized_access),
+    async with httpx.AsyncClient(
+        base_url=tester.base_url,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=8),
+        timeout=30,
+        headers={"Accept": "application/json"},
+    ) as client:
+        tester.client = client
+        return await run_sequence(tester)
+
+async def run_sequence(tester):
+    # Test stages: stages run in order, the tests inside a stage only depend
+    # on earlier stages and run concurrently
+    test_stages = [
+        [("Root Endpoint", tester.test_root_endpoint)],
+        [("Admin Authentication", tester.test_admin_login)],
+        [("Create Distributor", tester.test_create_distributor)],
+        [("Create Retailer", tester.test_create_retailer)],
+        [
+            ("Admin Dashboard Stats", tester.test_admin_dashboard_stats),
+            ("Distributor Dashboard Stats", tester.test_distributor_dashboard_stats),
+            ("Retailer Dashboard Stats", tester.test_retailer_dashboard_stats),
+            ("Get Users (Admin)", tester.test_get_users_admin),
+            ("Get Users (Distributor)", tester.test_get_users_distributor),
+            ("Auth Me Endpoints", tester.test_auth_me_endpoint),
+        ],
+        [("Create Certificate", tester.test_create_certificate)],
+        [
+            ("Get Certificate by ID", tester.test_get_certificate_by_id),
+            ("Update Certificate", tester.test_update_certificate),
+            ("Upload Certificate Image", tester.test_image_upload),
+        ],
+        [
+            ("Get Certificates (Retailer)", tester.test_get_certificates_retailer),
+            ("Get Certificates (Distributor)", tester.test_get_certificates_distributor),
+            ("Get Certificates (Admin)", tester.test_get_certificates_admin),
+        ],
+        [("Unauthorized Access", tester.test_unauthorized_access)],
     ]
     
-    print(f"\n📋 Running {len(test_sequence)} test categories...")
+    print(f"\n📋 Running {sum(len(stage) for stage in test_stages)} test categories...")
     
-    for test_name, test_func in test_sequence:
+    async def run_category(test_name, test_func):
         print(f"\n{'='*20} {test_name} {'='*20}")
         try:
-            test_func()
+            await test_func()
         except Exception as e:
             print(f"❌ Test category '{test_name}' failed with error: {str(e)}")
-            tester.failed_tests.append({
+            tester.record_failure({
                 "test": test_name,
                 "error": str(e)
             })
     
+    for stage in test_stages:
+        await asyncio.gather(*(run_category(*category) for category in stage))
+    
     # Print final results
     print("\n" + "="*60)
     print("📊 FINAL TEST RESULTS")
@@ -582,4 +631,4 @@ def main():
     return 0 if tester.tests_passed == tester.tests_run else 1
 
 if __name__ == "__main__":
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(asyncio.run(main()))
\ No newline at end of file
@@ -1,24 +1,34 @@
 """Database setup and ORM models for PostgreSQL backend.
 
 Uses SQLAlchemy 2.x async API with asyncpg driver and JSONB columns
-for flexible storage of nested certificate detail structures.
+for flexible storage of nested certificate detail structures. Identifier
+columns use the native `uuid` type but are exposed to Python as `str`.
 """
 from __future__ import annotations
 
+import asyncio
 import os
 import uuid
-from datetime import datetime, timezone
+from datetime import datetime
 from typing import AsyncGenerator
 
+import orjson
+
 from sqlalchemy import (
     String,
     DateTime,
+    Integer,
+    LargeBinary,
+    Numeric,
+    Sequence,
     ForeignKey,
     UniqueConstraint,
     func,
     Index,
+    insert,
+    text,
 )
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
@@ -33,10 +43,45 @@ POSTGRES_URL = os.getenv(
     ),
 )
 
-engine = create_async_engine(POSTGRES_URL, echo=bool(int(os.getenv("SQL_ECHO", "0"))))
+# Per process: each worker has its own pool, so a deployment can open up to
+# workers x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections. The defaults keep
+# four workers (60) under Postgres's default max_connections of 100.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "2"))
+# Connections opened at startup so the first requests skip connection setup
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+
+engine = create_async_engine(
+    POSTGRES_URL,
+    echo=bool(int(os.getenv("SQL_ECHO", "0"))),
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_pre_ping=True,
+    pool_recycle=1800,
+    connect_args={
+        # asyncpg's own statement cache and SQLAlchemy's prepared statement
+        # cache; large enough to keep every hot query prepared per connection
+        "statement_cache_size": 2048,
+        "prepared_statement_cache_size": 2048,
+        # JIT compilation costs more than it saves on these small queries
+        "server_settings": {"jit": "off", "application_name": "vcc"},
+    },
+)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, autoflush=False)
 
 
+async def warm_pool(connections: int = DB_POOL_WARM) -> None:
+    """Open `connections` pooled connections concurrently, then return them."""
+
+    async def _ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(_ping() for _ in range(min(connections, DB_POOL_SIZE))))
+
+
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:  # type: ignore
         yield session
@@ -46,7 +91,9 @@ async def get_session() -> AsyncGenerator[AsyncSession, None]:
 # Base Model
 # ---------------------------------------------------------------------------
 class Base(DeclarativeBase):
-    pass
+    # Timestamps are filled in by Postgres; fetch them back with INSERT ...
+    # RETURNING instead of a follow-up SELECT on attribute access
+    __mapper_args__ = {"eager_defaults": True}
 
 
 # ---------------------------------------------------------------------------
@@ -55,80 +102,297 @@ class Base(DeclarativeBase):
 class UserModel(Base):
     __tablename__ = "users"
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
     username: Mapped[str] = mapped_column(String(150), unique=True, index=True)
     password_hash: Mapped[str] = mapped_column(String(255))
-    password_salt: Mapped[bytes] = mapped_column(String(255))
+    # Only set for legacy PBKDF2 hashes; Argon2 hashes embed their own salt
+    password_salt: Mapped[bytes | None] = mapped_column(LargeBinary(32), nullable=True)
     role: Mapped[str] = mapped_column(String(32), index=True)
     company_name: Mapped[str | None] = mapped_column(String(255), nullable=True)
     contact_number: Mapped[str | None] = mapped_column(String(50), nullable=True)
-    created_by: Mapped[str | None] = mapped_column(String(36), ForeignKey("users.id"), nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # Indexed: "users created by X" lookups and the FK check on deleting X
+    created_by: Mapped[str | None] = mapped_column(
+        UUID(as_uuid=False), ForeignKey("users.id"), nullable=True, index=True
+    )
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
-    created_users: Mapped[list["UserModel"]] = relationship(remote_side=[id])
+    # Adjacency list over created_by: the users this one created, and its creator
+    created_users: Mapped[list["UserModel"]] = relationship(
+        foreign_keys=[created_by], back_populates="creator", lazy="raise"
+    )
+    creator: Mapped["UserModel | None"] = relationship(
+        remote_side=[id],
+        foreign_keys=[created_by],
+        back_populates="created_users",
+        lazy="raise",
+    )
     retailer_relationships: Mapped[list["RelationshipModel"]] = relationship(
-        back_populates="distributor", foreign_keys="RelationshipModel.distributor_id"
+        back_populates="distributor",
+        foreign_keys="RelationshipModel.distributor_id",
+        lazy="raise",
     )
     distributor_relationships: Mapped[list["RelationshipModel"]] = relationship(
-        back_populates="retailer", foreign_keys="RelationshipModel.retailer_id"
+        back_populates="retailer",
+        foreign_keys="RelationshipModel.retailer_id",
+        lazy="raise",
+    )
+    certificates: Mapped[list["CertificateModel"]] = relationship(
+        back_populates="retailer", lazy="raise"
     )
-    certificates: Mapped[list["CertificateModel"]] = relationship(back_populates="retailer")
 
 
 class RelationshipModel(Base):
     __tablename__ = "relationships"
     __table_args__ = (
+        # Also serves distributor_id lookups (leading column), as an
+        # index-only scan for the retailer id subqueries
         UniqueConstraint("distributor_id", "retailer_id", name="uq_distributor_retailer"),
-        Index("ix_relationship_distributor", "distributor_id"),
+        Index("ix_relationship_retailer", "retailer_id"),
     )
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    distributor_id: Mapped[str] = mapped_column(String(36), ForeignKey("users.id", ondelete="CASCADE"))
-    retailer_id: Mapped[str] = mapped_column(String(36), ForeignKey("users.id", ondelete="CASCADE"))
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
+    distributor_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("users.id", ondelete="CASCADE"))
+    retailer_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("users.id", ondelete="CASCADE"))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
     distributor: Mapped[UserModel] = relationship(
-        "UserModel", foreign_keys=[distributor_id], back_populates="retailer_relationships"
+        "UserModel",
+        foreign_keys=[distributor_id],
+        back_populates="retailer_relationships",
+        lazy="raise",
     )
     retailer: Mapped[UserModel] = relationship(
-        "UserModel", foreign_keys=[retailer_id], back_populates="distributor_relationships"
+        "UserModel",
+        foreign_keys=[retailer_id],
+        back_populates="distributor_relationships",
+        lazy="raise",
     )
 
 
+# Standalone so `create_all` creates it before the table whose default uses it
+certificate_no_seq = Sequence("cert_seq", start=1, metadata=Base.metadata)
+
+FITMENT_COLUMNS = (
+    "red_20mm",
+    "white_20mm",
+    "yellow_20mm",
+    "red_50mm",
+    "white_50mm",
+    "yellow_50mm",
+    "c3_plates",
+    "c4_plates",
+)
+
+
 class CertificateModel(Base):
     __tablename__ = "certificates"
     __table_args__ = (
-        Index("ix_certificate_retailer", "retailer_id"),
-        Index("ix_certificate_status", "status"),
+        # Serves retailer_id lookups (leading column) and per-retailer status
+        # counts as index-only scans
+        Index(
+            "ix_certificate_retailer_status",
+            "retailer_id",
+            "status",
+            postgresql_include=["id"],
+        ),
+        # Newest-first list pages, per retailer and across all certificates
+        Index("ix_cert_retailer_created", "retailer_id", "created_at", "id"),
+        Index("ix_cert_created", "created_at", "id"),
+        # Status has two values, so a plain index on it is rarely chosen;
+        # partial indexes hold only their own rows and serve the dashboard counts
+        Index(
+            "ix_cert_submitted",
+            "retailer_id",
+            postgresql_where=text("status = 'submitted'"),
+        ),
+        Index(
+            "ix_cert_draft",
+            "retailer_id",
+            postgresql_where=text("status = 'draft'"),
+        ),
+        # Exact registration number lookups: vehicle_details->>'registration_no' = ...
+        Index("ix_cert_vehicle_regno", text("(vehicle_details->>'registration_no')")),
+        # Ad-hoc containment queries: vehicle_details @> {...}
+        Index(
+            "ix_cert_vehicle_gin",
+            "vehicle_details",
+            postgresql_using="gin",
+            postgresql_ops={"vehicle_details": "jsonb_path_ops"},
+        ),
     )
 
-    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Allocated by Postgres: unique and monotonic, e.g. CERT00000042
     certificate_no: Mapped[str] = mapped_column(
-        String(32), unique=True, default=lambda: f"CERT{str(uuid.uuid4())[:8].upper()}"
+        String(32),
+        unique=True,
+        server_default=text("'CERT' || lpad(nextval('cert_seq')::text, 8, '0')"),
     )
-    retailer_id: Mapped[str] = mapped_column(String(36), ForeignKey("users.id", ondelete="CASCADE"))
+    retailer_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("users.id", ondelete="CASCADE"))
     dealer_name: Mapped[str] = mapped_column(String(255))
     dealer_license: Mapped[str] = mapped_column(String(255))
     vehicle_details: Mapped[dict] = mapped_column(JSONB)
     owner_details: Mapped[dict] = mapped_column(JSONB)
-    fitment_details: Mapped[dict] = mapped_column(JSONB)
-    fitment_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    images: Mapped[dict] = mapped_column(JSONB, default=dict)
+    # Fitment quantities are a fixed schema, so they are typed columns rather
+    # than JSONB: aggregates scan plain numerics and rows carry no key strings
+    red_20mm: Mapped[float] = mapped_column(Numeric(6, 2, asdecimal=False), default=0)
+    white_20mm: Mapped[float] = mapped_column(Numeric(6, 2, asdecimal=False), default=0)
+    yellow_20mm: Mapped[float] = mapped_column(Numeric(6, 2, asdecimal=False), default=0)
+    red_50mm: Mapped[float] = mapped_column(Numeric(6, 2, asdecimal=False), default=0)
+    white_50mm: Mapped[float] = mapped_column(Numeric(6, 2, asdecimal=False), default=0)
+    yellow_50mm: Mapped[float] = mapped_column(Numeric(6, 2, asdecimal=False), default=0)
+    c3_plates: Mapped[int] = mapped_column(Integer, default=0)
+    c4_plates: Mapped[int] = mapped_column(Integer, default=0)
+    fitment_date: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    # Only the detail endpoints need it; undefer() there, anything else raises
+    images: Mapped[dict] = mapped_column(
+        JSONB, default=dict, deferred=True, deferred_raiseload=True
+    )
     status: Mapped[str] = mapped_column(String(32), default="draft")
-    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+    retailer: Mapped[UserModel] = relationship(
+        "UserModel", back_populates="certificates", lazy="raise"
+    )
+    stored_images: Mapped[list["CertificateImageModel"]] = relationship(
+        back_populates="certificate",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
+
+    @property
+    def fitment_details(self) -> dict:
+        """The fitment columns re-assembled into the API's nested shape."""
+        return {name: getattr(self, name) for name in FITMENT_COLUMNS}
+
+    @fitment_details.setter
+    def fitment_details(self, values: dict) -> None:
+        for name in FITMENT_COLUMNS:
+            if name in values:
+                setattr(self, name, values[name])
 
-    retailer: Mapped[UserModel] = relationship("UserModel", back_populates="certificates")
+
+class CertificateImageModel(Base):
+    """Raw image bytes, kept out of `certificates` so row scans stay small.
+
+    `CertificateModel.images` maps image type -> `CertificateImageModel.id`.
+    """
+
+    __tablename__ = "certificate_images"
+    __table_args__ = (
+        UniqueConstraint("certificate_id", "image_type", name="uq_certificate_image_type"),
+    )
+
+    id: Mapped[str] = mapped_column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid.uuid4()))
+    certificate_id: Mapped[str] = mapped_column(UUID(as_uuid=False), ForeignKey("certificates.id", ondelete="CASCADE"))
+    image_type: Mapped[str] = mapped_column(String(16))
+    content_type: Mapped[str] = mapped_column(String(100), default="application/octet-stream")
+    size: Mapped[int] = mapped_column(Integer)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    certificate: Mapped[CertificateModel] = relationship(back_populates="stored_images", lazy="raise")
+
+
+# ---------------------------------------------------------------------------
+# Schema maintenance
+# ---------------------------------------------------------------------------
+# Indexes dropped from the models; removed from existing databases at startup
+OBSOLETE_INDEXES = (
+    "ix_certificate_retailer",
+    "ix_certificate_status",
+    "ix_relationship_distributor",
+)
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    # `create_all` skips tables that already exist, including their indexes,
+    # so indexes added to a model later are created here.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
+async def ensure_schema() -> None:
+    """Create missing tables/indexes and drop obsolete ones; idempotent."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
+        for name in OBSOLETE_INDEXES:
+            await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
 
 
 # ---------------------------------------------------------------------------
-# Helper query functions (optional convenience)
+# Bulk seeding (load tests, fixtures)
 # ---------------------------------------------------------------------------
-async def count_users(session: AsyncSession) -> int:
-    result = await session.execute(func.count(UserModel.id))
-    return int(result.scalar() or 0)
+# Above this many rows COPY beats a pipelined executemany INSERT
+BULK_COPY_THRESHOLD = 10_000
+
+# Columns written by the COPY path; everything else takes its server default
+_CERTIFICATE_COPY_COLUMNS = (
+    "id",
+    "retailer_id",
+    "dealer_name",
+    "dealer_license",
+    "vehicle_details",
+    "owner_details",
+    "images",
+    "status",
+    *FITMENT_COLUMNS,
+)
+
+
+def _certificate_values(row: dict) -> dict:
+    """Flatten an API-shaped certificate (nested fitment_details) into column values."""
+    values = {k: v for k, v in row.items() if k != "fitment_details"}
+    fitment = row.get("fitment_details") or {}
+    for name in FITMENT_COLUMNS:
+        values.setdefault(name, fitment.get(name, 0))
+    values.setdefault("id", str(uuid.uuid4()))
+    values.setdefault("images", {})
+    values.setdefault("status", "draft")
+    return values
+
+
+async def bulk_insert_certificates(session: AsyncSession, rows: list[dict]) -> int:
+    """Insert many certificates in as few round trips as possible and commit.
 
+    Small batches go through one executemany INSERT (pipelined by asyncpg);
+    batches of BULK_COPY_THRESHOLD rows or more are streamed with COPY.
+    certificate_no and the timestamps are filled in by Postgres either way.
 
-async def count_certificates(session: AsyncSession) -> int:
-    result = await session.execute(func.count(CertificateModel.id))
-    return int(result.scalar() or 0)
+    Both paths run on the session's own connection inside its transaction:
+    rows already flushed in the session are visible to them, and the final
+    commit covers everything. If the insert fails nothing is committed; the
+    caller rolls the session back (leaving its context manager does).
+    """
+    values = [_certificate_values(row) for row in rows]
+    if not values:
+        return 0
+    if len(values) < BULK_COPY_THRESHOLD:
+        await session.execute(insert(CertificateModel), values)
+    else:
+        # session.connection() begins the session's transaction if needed,
+        # so COPY is committed (or rolled back) together with the session
+        conn = await session.connection()
+        raw = await conn.get_raw_connection()
+        # The dialect's JSONB codec takes already-serialised text
+        json_columns = {"vehicle_details", "owner_details", "images"}
+        records = [
+            tuple(
+                orjson.dumps(v[c]).decode() if c in json_columns else v[c]
+                for c in _CERTIFICATE_COPY_COLUMNS
+            )
+            for v in values
+        ]
+        await raw.driver_connection.copy_records_to_table(
+            CertificateModel.__tablename__,
+            records=records,
+            columns=list(_CERTIFICATE_COPY_COLUMNS),
+        )
+    await session.commit()
+    return len(values)
@@ -1,6 +1,14 @@
 import { clsx } from "clsx";
 import { twMerge } from "tailwind-merge"
+import axios from "axios";
 
 export function cn(...inputs) {
   return twMerge(clsx(inputs));
 }
+
+// List endpoints return one page at a time; X-Next-Cursor is set when more
+// rows follow and is passed back as `after` to fetch them
+export async function fetchPage(url, after) {
+  const response = await axios.get(url, { params: after ? { after } : {} });
+  return { items: response.data, nextCursor: response.headers["x-next-cursor"] || null };
+}
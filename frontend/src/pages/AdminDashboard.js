@@ -11,6 +11,7 @@ import { Label } from "../components/ui/label";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "../components/ui/select";
 import { useAuth } from "../App";
 import { useToast } from "@/hooks/use-toast";
+import { fetchPage } from "@/lib/utils";
 import Layout from "../components/Layout";
 import { Users, FileText, Building2, UserPlus, BarChart3, TrendingUp } from "lucide-react";
 
@@ -191,6 +192,7 @@ const AdminOverview = () => {
 
 const UserManagement = () => {
     const [users, setUsers] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const [showCreateUser, setShowCreateUser] = useState(false);
     const { toast } = useToast();
@@ -199,10 +201,11 @@ const UserManagement = () => {
         fetchUsers();
     }, []);
 
-    const fetchUsers = async () => {
+    const fetchUsers = async (after) => {
         try {
-            const response = await axios.get(`${API}/users`);
-            setUsers(response.data);
+            const page = await fetchPage(`${API}/users`, after);
+            setUsers((prev) => (after ? [...prev, ...page.items] : page.items));
+            setNextCursor(page.nextCursor);
         } catch (error) {
             toast({
                 title: "Error",
@@ -252,41 +255,50 @@ const UserManagement = () => {
                             <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-emerald-500"></div>
                         </div>
                     ) : (
-                        <Table>
-                            <TableHeader>
-                                <TableRow>
-                                    <TableHead>Username</TableHead>
-                                    <TableHead>Role</TableHead>
-                                    <TableHead>Company</TableHead>
-                                    <TableHead>Contact</TableHead>
-                                    <TableHead>Created</TableHead>
-                                </TableRow>
-                            </TableHeader>
-                            <TableBody>
-                                {users.map((user) => (
-                                    <TableRow key={user.id} data-testid={`user-row-${user.username}`}>
-                                        <TableCell className="font-medium">{user.username}</TableCell>
-                                        <TableCell>
-                                            <Badge
-                                                variant="outline"
-                                                className={
-                                                    user.role === "admin"
-                                                        ? "text-red-700 border-red-300"
-                                                        : user.role === "distributor"
-                                                        ? "text-blue-700 border-blue-300"
-                                                        : "text-purple-700 border-purple-300"
-                                                }
-                                            >
-                                                {user.role}
-                                            </Badge>
-                                        </TableCell>
-                                        <TableCell>{user.company_name || "-"}</TableCell>
-                                        <TableCell>{user.contact_number || "-"}</TableCell>
-                                        <TableCell>{new Date(user.created_at).toLocaleDateString()}</TableCell>
+                        <>
+                            <Table>
+                                <TableHeader>
+                                    <TableRow>
+                                        <TableHead>Username</TableHead>
+                                        <TableHead>Role</TableHead>
+                                        <TableHead>Company</TableHead>
+                                        <TableHead>Contact</TableHead>
+                                        <TableHead>Created</TableHead>
                                     </TableRow>
-                                ))}
-                            </TableBody>
-                        </Table>
+                                </TableHeader>
+                                <TableBody>
+                                    {users.map((user) => (
+                                        <TableRow key={user.id} data-testid={`user-row-${user.username}`}>
+                                            <TableCell className="font-medium">{user.username}</TableCell>
+                                            <TableCell>
+                                                <Badge
+                                                    variant="outline"
+                                                    className={
+                                                        user.role === "admin"
+                                                            ? "text-red-700 border-red-300"
+                                                            : user.role === "distributor"
+                                                            ? "text-blue-700 border-blue-300"
+                                                            : "text-purple-700 border-purple-300"
+                                                    }
+                                                >
+                                                    {user.role}
+                                                </Badge>
+                                            </TableCell>
+                                            <TableCell>{user.company_name || "-"}</TableCell>
+                                            <TableCell>{user.contact_number || "-"}</TableCell>
+                                            <TableCell>{new Date(user.created_at).toLocaleDateString()}</TableCell>
+                                        </TableRow>
+                                    ))}
+                                </TableBody>
+                            </Table>
+                            {nextCursor && (
+                                <div className="flex justify-center pt-4">
+                                    <Button variant="outline" onClick={() => fetchUsers(nextCursor)} data-testid="users-load-more">
+                                        Load more
+                                    </Button>
+                                </div>
+                            )}
+                        </>
                     )}
                 </CardContent>
             </Card>
@@ -394,6 +406,7 @@ const CreateUserForm = ({ onSuccess }) => {
 
 const CertificateManagement = () => {
     const [certificates, setCertificates] = useState([]);
+    const [nextCursor, setNextCursor] = useState(null);
     const [loading, setLoading] = useState(true);
     const { toast } = useToast();
 
@@ -401,10 +414,11 @@ const CertificateManagement = () => {
         fetchCertificates();
     }, []);
 
-    const fetchCertificates = async () => {
+    const fetchCertificates = async (after) => {
         try {
-            const response = await axios.get(`${API}/certificates`);
-            setCertificates(response.data);
+            const page = await fetchPage(`${API}/certificates`, after);
+            setCertificates((prev) => (after ? [...prev, ...page.items] : page.items));
+            setNextCursor(page.nextCursor);
         } catch (error) {
             toast({
                 title: "Error",
@@ -433,50 +447,59 @@ const CertificateManagement = () => {
                             <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-emerald-500"></div>
                         </div>
                     ) : (
-                        <Table>
-                            <TableHeader>
-                                <TableRow>
-                                    <TableHead>Certificate No</TableHead>
-                                    <TableHead>Dealer</TableHead>
-                                    <TableHead>Vehicle</TableHead>
-                                    <TableHead>Status</TableHead>
-                                    <TableHead>Created</TableHead>
-                                    <TableHead>Actions</TableHead>
-                                </TableRow>
-                            </TableHeader>
-                            <TableBody>
-                                {certificates.map((cert) => (
-                                    <TableRow key={cert.id} data-testid={`certificate-row-${cert.certificate_no}`}>
-                                        <TableCell className="font-medium">{cert.certificate_no}</TableCell>
-                                        <TableCell>{cert.dealer_name}</TableCell>
-                                        <TableCell>{cert.vehicle_details.registration_no}</TableCell>
-                                        <TableCell>
-                                            <Badge
-                                                variant="outline"
-                                                className={
-                                                    cert.status === "submitted"
-                                                        ? "text-green-700 border-green-300"
-                                                        : "text-yellow-700 border-yellow-300"
-                                                }
-                                            >
-                                                {cert.status}
-                                            </Badge>
-                                        </TableCell>
-                                        <TableCell>{new Date(cert.created_at).toLocaleDateString()}</TableCell>
-                                        <TableCell>
-                                            <Button
-                                                variant="outline"
-                                                size="sm"
-                                                onClick={() => window.open(`/certificate/${cert.id}`, "_blank")}
-                                                data-testid={`view-certificate-${cert.id}`}
-                                            >
-                                                View
-                                            </Button>
-                                        </TableCell>
+                        <>
+                            <Table>
+                                <TableHeader>
+                                    <TableRow>
+                                        <TableHead>Certificate No</TableHead>
+                                        <TableHead>Dealer</TableHead>
+                                        <TableHead>Vehicle</TableHead>
+                                        <TableHead>Status</TableHead>
+                                        <TableHead>Created</TableHead>
+                                        <TableHead>Actions</TableHead>
                                     </TableRow>
-                                ))}
-                            </TableBody>
-                        </Table>
+                                </TableHeader>
+                                <TableBody>
+                                    {certificates.map((cert) => (
+                                        <TableRow key={cert.id} data-testid={`certificate-row-${cert.certificate_no}`}>
+                                            <TableCell className="font-medium">{cert.certificate_no}</TableCell>
+                                            <TableCell>{cert.dealer_name}</TableCell>
+                                            <TableCell>{cert.vehicle_details.registration_no}</TableCell>
+                                            <TableCell>
+                                                <Badge
+                                                    variant="outline"
+                                                    className={
+                                                        cert.status === "submitted"
+                                                            ? "text-green-700 border-green-300"
+                                                            : "text-yellow-700 border-yellow-300"
+                                                    }
+                                                >
+                                                    {cert.status}
+                                                </Badge>
+                                            </TableCell>
+                                            <TableCell>{new Date(cert.created_at).toLocaleDateString()}</TableCell>
+                                            <TableCell>
+                                                <Button
+                                                    variant="outline"
+                                                    size="sm"
+                                                    onClick={() => window.open(`/certificate/${cert.id}`, "_blank")}
+                                                    data-testid={`view-certificate-${cert.id}`}
+                                                >
+                                                    View
+                                                </Button>
+                                            </TableCell>
+                                        </TableRow>
+                                    ))}
+                                </TableBody>
+                            </Table>
+                            {nextCursor && (
+                                <div className="flex justify-center pt-4">
+                                    <Button variant="outline" onClick={() => fetchCertificates(nextCursor)} data-testid="certificates-load-more">
+                                        Load more
+                                    </Button>
+                                </div>
+                            )}
+                        </>
                     )}
                 </CardContent>
             </Card>
@@ -496,7 +496,7 @@ const CertificateForm = () => {
                       {images[imageType] ? (
                         <div className="relative">
                           <img 
-                            src={images[imageType].startsWith('data:') ? images[imageType] : `data:image/jpeg;base64,${images[imageType]}`} 
+                            src={/^(data:|https?:)/.test(images[imageType]) ? images[imageType] : `data:image/jpeg;base64,${images[imageType]}`} 
                             alt={`Vehicle ${imageType}`} 
                             className="w-full h-32 object-cover rounded-md"
                           />
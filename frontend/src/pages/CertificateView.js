@@ -303,7 +303,7 @@ const CertificateView = () => {
                       {imageType === 'side1' ? 'Side 1' : imageType === 'side2' ? 'Side 2' : imageType}
                     </h4>
                     <img 
-                      src={imageData.startsWith('data:') ? imageData : `data:image/jpeg;base64,${imageData}`}
+                      src={/^(data:|https?:)/.test(imageData) ? imageData : `data:image/jpeg;base64,${imageData}`}
                       alt={`Vehicle ${imageType}`} 
                       className="w-full h-48 object-cover rounded-lg border border-gray-200"
                       data-testid={`vehicle-image-${imageType}`}
@@ -10,6 +10,7 @@ import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
 import { useAuth } from '../App';
 import { useToast } from '@/hooks/use-toast';
+import { fetchPage } from '@/lib/utils';
 import Layout from '../components/Layout';
 import { Users, FileText, UserPlus, TrendingUp, Building2 } from 'lucide-react';
 
@@ -176,6 +177,7 @@ const DistributorOverview = () => {
 
 const RetailerManagement = () => {
   const [retailers, setRetailers] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showCreateRetailer, setShowCreateRetailer] = useState(false);
   const { toast } = useToast();
@@ -184,10 +186,12 @@ const RetailerManagement = () => {
     fetchRetailers();
   }, []);
 
-  const fetchRetailers = async () => {
+  const fetchRetailers = async (after) => {
     try {
-      const response = await axios.get(`${API}/users`);
-      setRetailers(response.data.filter(user => user.role === 'retailer'));
+      const page = await fetchPage(`${API}/users`, after);
+      const pageRetailers = page.items.filter(user => user.role === 'retailer');
+      setRetailers((prev) => (after ? [...prev, ...pageRetailers] : pageRetailers));
+      setNextCursor(page.nextCursor);
     } catch (error) {
       toast({
         title: "Error",
@@ -232,32 +236,41 @@ const RetailerManagement = () => {
               <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-emerald-500"></div>
             </div>
           ) : (
-            <Table>
-              <TableHeader>
-                <TableRow>
-                  <TableHead>Username</TableHead>
-                  <TableHead>Company</TableHead>
-                  <TableHead>Contact</TableHead>
-                  <TableHead>Created</TableHead>
-                  <TableHead>Status</TableHead>
-                </TableRow>
-              </TableHeader>
-              <TableBody>
-                {retailers.map((retailer) => (
-                  <TableRow key={retailer.id} data-testid={`retailer-row-${retailer.username}`}>
-                    <TableCell className="font-medium">{retailer.username}</TableCell>
-                    <TableCell>{retailer.company_name || '-'}</TableCell>
-                    <TableCell>{retailer.contact_number || '-'}</TableCell>
-                    <TableCell>{new Date(retailer.created_at).toLocaleDateString()}</TableCell>
-                    <TableCell>
-                      <Badge variant="secondary" className="bg-green-100 text-green-700">
-                        Active
-                      </Badge>
-                    </TableCell>
+            <>
+              <Table>
+                <TableHeader>
+                  <TableRow>
+                    <TableHead>Username</TableHead>
+                    <TableHead>Company</TableHead>
+                    <TableHead>Contact</TableHead>
+                    <TableHead>Created</TableHead>
+                    <TableHead>Status</TableHead>
                   </TableRow>
-                ))}
-              </TableBody>
-            </Table>
+                </TableHeader>
+                <TableBody>
+                  {retailers.map((retailer) => (
+                    <TableRow key={retailer.id} data-testid={`retailer-row-${retailer.username}`}>
+                      <TableCell className="font-medium">{retailer.username}</TableCell>
+                      <TableCell>{retailer.company_name || '-'}</TableCell>
+                      <TableCell>{retailer.contact_number || '-'}</TableCell>
+                      <TableCell>{new Date(retailer.created_at).toLocaleDateString()}</TableCell>
+                      <TableCell>
+                        <Badge variant="secondary" className="bg-green-100 text-green-700">
+                          Active
+                        </Badge>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+              {nextCursor && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={() => fetchRetailers(nextCursor)} data-testid="retailers-load-more">
+                    Load more
+                  </Button>
+                </div>
+              )}
+            </>
           )}
         </CardContent>
       </Card>
@@ -352,6 +365,7 @@ const CreateRetailerForm = ({ onSuccess }) => {
 
 const CertificateManagement = () => {
   const [certificates, setCertificates] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const { toast } = useToast();
 
@@ -359,10 +373,11 @@ const CertificateManagement = () => {
     fetchCertificates();
   }, []);
 
-  const fetchCertificates = async () => {
+  const fetchCertificates = async (after) => {
     try {
-      const response = await axios.get(`${API}/certificates`);
-      setCertificates(response.data);
+      const page = await fetchPage(`${API}/certificates`, after);
+      setCertificates((prev) => (after ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.nextCursor);
     } catch (error) {
       toast({
         title: "Error",
@@ -391,49 +406,58 @@ const CertificateManagement = () => {
               <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-emerald-500"></div>
             </div>
           ) : (
-            <Table>
-              <TableHeader>
-                <TableRow>
-                  <TableHead>Certificate No</TableHead>
-                  <TableHead>Dealer</TableHead>
-                  <TableHead>Vehicle</TableHead>
-                  <TableHead>Status</TableHead>
-                  <TableHead>Created</TableHead>
-                  <TableHead>Actions</TableHead>
-                </TableRow>
-              </TableHeader>
-              <TableBody>
-                {certificates.map((cert) => (
-                  <TableRow key={cert.id} data-testid={`distributor-cert-row-${cert.certificate_no}`}>
-                    <TableCell className="font-medium">{cert.certificate_no}</TableCell>
-                    <TableCell>{cert.dealer_name}</TableCell>
-                    <TableCell>{cert.vehicle_details.registration_no}</TableCell>
-                    <TableCell>
-                      <Badge 
-                        variant="outline" 
-                        className={cert.status === 'submitted' 
-                          ? 'text-green-700 border-green-300' 
-                          : 'text-yellow-700 border-yellow-300'
-                        }
-                      >
-                        {cert.status}
-                      </Badge>
-                    </TableCell>
-                    <TableCell>{new Date(cert.created_at).toLocaleDateString()}</TableCell>
-                    <TableCell>
-                      <Button 
-                        variant="outline" 
-                        size="sm" 
-                        onClick={() => window.open(`/certificate/${cert.id}`, '_blank')}
-                        data-testid={`view-distributor-cert-${cert.id}`}
-                      >
-                        View
-                      </Button>
-                    </TableCell>
+            <>
+              <Table>
+                <TableHeader>
+                  <TableRow>
+                    <TableHead>Certificate No</TableHead>
+                    <TableHead>Dealer</TableHead>
+                    <TableHead>Vehicle</TableHead>
+                    <TableHead>Status</TableHead>
+                    <TableHead>Created</TableHead>
+                    <TableHead>Actions</TableHead>
                   </TableRow>
-                ))}
-              </TableBody>
-            </Table>
+                </TableHeader>
+                <TableBody>
+                  {certificates.map((cert) => (
+                    <TableRow key={cert.id} data-testid={`distributor-cert-row-${cert.certificate_no}`}>
+                      <TableCell className="font-medium">{cert.certificate_no}</TableCell>
+                      <TableCell>{cert.dealer_name}</TableCell>
+                      <TableCell>{cert.vehicle_details.registration_no}</TableCell>
+                      <TableCell>
+                        <Badge 
+                          variant="outline" 
+                          className={cert.status === 'submitted' 
+                            ? 'text-green-700 border-green-300' 
+                            : 'text-yellow-700 border-yellow-300'
+                          }
+                        >
+                          {cert.status}
+                        </Badge>
+                      </TableCell>
+                      <TableCell>{new Date(cert.created_at).toLocaleDateString()}</TableCell>
+                      <TableCell>
+                        <Button 
+                          variant="outline" 
+                          size="sm" 
+                          onClick={() => window.open(`/certificate/${cert.id}`, '_blank')}
+                          data-testid={`view-distributor-cert-${cert.id}`}
+                        >
+                          View
+                        </Button>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+              {nextCursor && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={() => fetchCertificates(nextCursor)} data-testid="certificates-load-more">
+                    Load more
+                  </Button>
+                </div>
+              )}
+            </>
           )}
         </CardContent>
       </Card>
@@ -7,6 +7,7 @@ import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '.
 import { Badge } from '../components/ui/badge';
 import { useAuth } from '../App';
 import { useToast } from '@/hooks/use-toast';
+import { fetchPage } from '@/lib/utils';
 import Layout from '../components/Layout';
 import { FileText, PlusCircle, TrendingUp, Clock, CheckCircle } from 'lucide-react';
 
@@ -51,12 +52,11 @@ const RetailerOverview = () => {
 
   const fetchRecentCertificates = async () => {
     try {
-      const response = await axios.get(`${API}/certificates`);
-      // Get the 5 most recent certificates
-      const recent = response.data
-        .sort((a, b) => new Date(b.created_at) - new Date(a.created_at))
-        .slice(0, 5);
-      setRecentCertificates(recent);
+      // The API lists newest first, so the first page is the 5 most recent
+      const response = await axios.get(`${API}/certificates`, {
+        params: { limit: 5 },
+      });
+      setRecentCertificates(response.data);
     } catch (error) {
       toast({
         title: "Error",
@@ -206,6 +206,7 @@ const RetailerOverview = () => {
 
 const CertificateManagement = () => {
   const [certificates, setCertificates] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const { toast } = useToast();
 
@@ -213,10 +214,11 @@ const CertificateManagement = () => {
     fetchCertificates();
   }, []);
 
-  const fetchCertificates = async () => {
+  const fetchCertificates = async (after) => {
     try {
-      const response = await axios.get(`${API}/certificates`);
-      setCertificates(response.data);
+      const page = await fetchPage(`${API}/certificates`, after);
+      setCertificates((prev) => (after ? [...prev, ...page.items] : page.items));
+      setNextCursor(page.nextCursor);
     } catch (error) {
       toast({
         title: "Error",
@@ -253,61 +255,70 @@ const CertificateManagement = () => {
               <div className="animate-spin rounded-full h-6 w-6 border-b-2 border-emerald-500"></div>
             </div>
           ) : certificates.length > 0 ? (
-            <Table>
-              <TableHeader>
-                <TableRow>
-                  <TableHead>Certificate No</TableHead>
-                  <TableHead>Vehicle Registration</TableHead>
-                  <TableHead>Dealer License</TableHead>
-                  <TableHead>Status</TableHead>
-                  <TableHead>Created</TableHead>
-                  <TableHead>Actions</TableHead>
-                </TableRow>
-              </TableHeader>
-              <TableBody>
-                {certificates.map((cert) => (
-                  <TableRow key={cert.id} data-testid={`retailer-cert-row-${cert.certificate_no}`}>
-                    <TableCell className="font-medium">{cert.certificate_no}</TableCell>
-                    <TableCell>{cert.vehicle_details.registration_no}</TableCell>
-                    <TableCell>{cert.dealer_license}</TableCell>
-                    <TableCell>
-                      <Badge 
-                        variant="outline" 
-                        className={cert.status === 'submitted' 
-                          ? 'text-green-700 border-green-300' 
-                          : 'text-yellow-700 border-yellow-300'
-                        }
-                      >
-                        {cert.status}
-                      </Badge>
-                    </TableCell>
-                    <TableCell>{new Date(cert.created_at).toLocaleDateString()}</TableCell>
-                    <TableCell>
-                      <div className="flex gap-2">
-                        <Button 
+            <>
+              <Table>
+                <TableHeader>
+                  <TableRow>
+                    <TableHead>Certificate No</TableHead>
+                    <TableHead>Vehicle Registration</TableHead>
+                    <TableHead>Dealer License</TableHead>
+                    <TableHead>Status</TableHead>
+                    <TableHead>Created</TableHead>
+                    <TableHead>Actions</TableHead>
+                  </TableRow>
+                </TableHeader>
+                <TableBody>
+                  {certificates.map((cert) => (
+                    <TableRow key={cert.id} data-testid={`retailer-cert-row-${cert.certificate_no}`}>
+                      <TableCell className="font-medium">{cert.certificate_no}</TableCell>
+                      <TableCell>{cert.vehicle_details.registration_no}</TableCell>
+                      <TableCell>{cert.dealer_license}</TableCell>
+                      <TableCell>
+                        <Badge 
                           variant="outline" 
-                          size="sm" 
-                          onClick={() => window.open(`/certificate/${cert.id}`, '_blank')}
-                          data-testid={`view-cert-${cert.id}`}
+                          className={cert.status === 'submitted' 
+                            ? 'text-green-700 border-green-300' 
+                            : 'text-yellow-700 border-yellow-300'
+                          }
                         >
-                          View
-                        </Button>
-                        {cert.status === 'draft' && (
+                          {cert.status}
+                        </Badge>
+                      </TableCell>
+                      <TableCell>{new Date(cert.created_at).toLocaleDateString()}</TableCell>
+                      <TableCell>
+                        <div className="flex gap-2">
                           <Button 
                             variant="outline" 
                             size="sm" 
-                            onClick={() => window.open(`/certificate/edit/${cert.id}`, '_blank')}
-                            data-testid={`edit-cert-${cert.id}`}
+                            onClick={() => window.open(`/certificate/${cert.id}`, '_blank')}
+                            data-testid={`view-cert-${cert.id}`}
                           >
-                            Edit
+                            View
                           </Button>
-                        )}
-                      </div>
-                    </TableCell>
-                  </TableRow>
-                ))}
-              </TableBody>
-            </Table>
+                          {cert.status === 'draft' && (
+                            <Button 
+                              variant="outline" 
+                              size="sm" 
+                              onClick={() => window.open(`/certificate/edit/${cert.id}`, '_blank')}
+                              data-testid={`edit-cert-${cert.id}`}
+                            >
+                              Edit
+                            </Button>
+                          )}
+                        </div>
+                      </TableCell>
+                    </TableRow>
+                  ))}
+                </TableBody>
+              </Table>
+              {nextCursor && (
+                <div className="flex justify-center pt-4">
+                  <Button variant="outline" onClick={() => fetchCertificates(nextCursor)} data-testid="certificates-load-more">
+                    Load more
+                  </Button>
+                </div>
+              )}
+            </>
           ) : (
             <div className="text-center py-12">
               <FileText className="w-16 h-16 text-gray-300 mx-auto mb-4" />
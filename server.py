@@ -1,23 +1,36 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, Request, status, UploadFile, File, Query
+from fastapi import Path as PathParam
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, RedirectResponse, Response
 from dotenv import load_dotenv
-from passlib.context import CryptContext
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from cachetools import TTLCache
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Annotated, Dict, FrozenSet, Iterable, List, Optional
 import uuid
+import time
 from datetime import datetime, timezone, timedelta
-import jwt
-import base64
+import orjson
+import pybase64
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
+from functools import lru_cache
 
-from sqlalchemy import select, update, func
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import bindparam, delete, exists, select, update, func, true, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
 import hashlib
+import hmac
 
 
 from database import (
@@ -25,9 +38,11 @@ from database import (
     UserModel,
     RelationshipModel,
     CertificateModel,
-    Base as ORMBase,
+    CertificateImageModel,
     engine as orm_engine,
     AsyncSessionLocal,
+    ensure_schema,
+    warm_pool,
 )
 
 ROOT_DIR = Path(__file__).parent
@@ -37,35 +52,128 @@ load_dotenv(ROOT_DIR / ".env")
 
 # Security configuration
 SECRET_KEY = os.environ.get("SECRET_KEY", "change-me-in-prod")
+SECRET_KEY_BYTES = SECRET_KEY.encode("utf-8")  # encoded once, reused per token
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
 
-# Password hashing (secure bcrypt via passlib)
-# pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Seconds /health waits for its database probe
+HEALTH_DB_TIMEOUT = 2.0
 
+# Refuse to start on the stock asyncio loop (set in production deployments)
+REQUIRE_UVLOOP = bool(int(os.environ.get("REQUIRE_UVLOOP", "0")))
+
+# Password hashing (Argon2id, RFC 9106 "second recommended" parameters)
+password_hasher = PasswordHasher(time_cost=3, memory_cost=65536, parallelism=2)
+
+# Short-lived cache of login verification outcomes so bursts of repeated
+# logins skip the memory-hard Argon2 work. Keys are a BLAKE2b digest of the
+# username, stored hash and candidate password; values are booleans.
+_pw_cache: TTLCache = TTLCache(maxsize=2048, ttl=30)
+
+# Dedicated threads for hashing/verification: KDF work runs off the event
+# loop (argon2 and OpenSSL release the GIL, so it spreads across cores)
+# without competing with FastAPI's shared threadpool, and concurrent Argon2
+# memory use is bounded by the worker count. The pool lives as long as the
+# process (its threads are joined at interpreter exit), so it is not shut
+# down by the lifespan and keeps working across repeated startups.
+_password_pool = ThreadPoolExecutor(
+    max_workers=os.cpu_count() or 1, thread_name_prefix="password"
+)
 
-def hash_password(password: str) -> tuple[bytes, bytes]:
-    password_bytes = password.encode("utf-8")
-    salt = os.urandom(16)
-    key = hashlib.pbkdf2_hmac("sha256", password_bytes, salt, 100000)
-    return salt, key
 
+async def run_password_work(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_password_pool, func, *args)
 
-def verify_password(password: str, salt: bytes, stored_key: bytes) -> bool:
+
+def hash_password(password: str) -> str:
+    return password_hasher.hash(password)
+
+
+def _verify_legacy_password(password: str, salt: bytes, stored_key: bytes) -> bool:
+    """Verify a pre-Argon2 PBKDF2-SHA256 hash (salt stored separately)."""
     password_bytes = password.encode("utf-8")
 
-    # Recompute the hash with the same salt
-    new_key = hashlib.pbkdf2_hmac("sha256", password_bytes, salt, 100000)
+    # Recompute the hash with the same salt; OpenSSL's PBKDF2 uses the CPU's
+    # SHA extensions where available
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=100000)
+    new_key = kdf.derive(password_bytes)
+
+    # Constant-time compare (text columns may hold the key hex-encoded)
+    if isinstance(stored_key, str):
+        return hmac.compare_digest(new_key.hex(), stored_key)
+    return hmac.compare_digest(new_key, stored_key)
+
+
+def is_legacy_hash(stored_hash) -> bool:
+    return not (isinstance(stored_hash, str) and stored_hash.startswith("$argon2"))
+
+
+def verify_password(password: str, stored_hash, salt: Optional[bytes] = None) -> bool:
+    if is_legacy_hash(stored_hash):
+        if not salt:
+            return False
+        return _verify_legacy_password(password, salt, stored_hash)
+    try:
+        return password_hasher.verify(stored_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+async def verify_password_cached(
+    username: str, password: str, stored_hash, salt: Optional[bytes] = None
+) -> bool:
+    """`verify_password` memoised for a few seconds per (user, hash, password).
+
+    The full stored hash is part of the key so a password change (or a rehash)
+    never serves a stale result. Misses are verified in a worker thread so the
+    KDF never blocks the event loop.
+    """
+    key = hashlib.blake2b(
+        f"{username}\x00{stored_hash}\x00{password}".encode("utf-8"), digest_size=16
+    ).digest()
+    cached = _pw_cache.get(key)
+    if cached is None:
+        cached = await run_password_work(verify_password, password, stored_hash, salt)
+        _pw_cache[key] = cached
+    return cached
+
+
+def needs_rehash(stored_hash) -> bool:
+    return is_legacy_hash(stored_hash) or password_hasher.check_needs_rehash(stored_hash)
+
+
+# auto_error is off: a token already resolved by AuthASGIMiddleware needs no
+# credentials parsing, and a missing header is rejected in get_current_user
+security = HTTPBearer(auto_error=False)
 
-    # Compare safely
-    return new_key == stored_key
+# Resolved users per bearer token (keyed by a 128-bit BLAKE2b digest of the
+# token). A hit skips both the signature check and the user lookup. Only
+# successful validations are cached; entries are dropped once the token's
+# own `exp` has passed even if the TTL has not.
+_jwt_cache: TTLCache = TTLCache(maxsize=10000, ttl=30)
 
 
-security = HTTPBearer()
+class AppJSONResponse(ORJSONResponse):
+    """orjson rendering for every response.
+
+    On top of FastAPI's ORJSONResponse options, naive datetimes are emitted
+    as UTC so all timestamps carry an offset.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content,
+            option=orjson.OPT_NAIVE_UTC
+            | orjson.OPT_NON_STR_KEYS
+            | orjson.OPT_SERIALIZE_NUMPY,
+        )
 
 
 # Lifespan placeholder (defined later) will be attached after definition; temporarily create app without lifespan
-app = FastAPI(title="Vehicle Conspicuity Management System")
+app = FastAPI(
+    title="Vehicle Conspicuity Management System",
+    default_response_class=AppJSONResponse,
+)
 api_router = APIRouter(prefix="/api")
 
 
@@ -76,6 +184,86 @@ class UserRole:
     RETAILER = "retailer"
 
 
+IMAGE_TYPES = ("front", "back", "side1", "side2")
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Largest accepted image upload; bigger files are rejected with 413
+MAX_IMAGE_BYTES = int(os.environ.get("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+
+# Optional object storage for images (S3 or an S3-compatible service such as
+# MinIO). When a bucket is configured, uploads go there and clients are handed
+# short-lived presigned URLs; otherwise images stay in `certificate_images`.
+IMAGE_BUCKET = os.environ.get("IMAGE_BUCKET")
+S3_ENDPOINT_URL = os.environ.get("S3_ENDPOINT_URL")
+IMAGE_URL_TTL = int(os.environ.get("IMAGE_URL_TTL", "900"))
+S3_REF_PREFIX = "s3://"
+
+
+# Created once by the lifespan: boto3 client creation is not thread-safe and
+# the client is first used from to_thread workers
+_s3_client = None
+
+
+def init_s3_client() -> None:
+    global _s3_client
+    if IMAGE_BUCKET and _s3_client is None:
+        import boto3  # only needed when IMAGE_BUCKET is set
+
+        _s3_client = boto3.client("s3", endpoint_url=S3_ENDPOINT_URL)
+
+
+def s3_client():
+    if _s3_client is None:
+        raise RuntimeError("S3 client not initialised (needs IMAGE_BUCKET and app startup)")
+    return _s3_client
+
+
+def presigned_image_url(ref: str) -> str:
+    """Short-lived GET URL for an `s3://bucket/key` image reference."""
+    bucket, _, key = ref[len(S3_REF_PREFIX):].partition("/")
+    # Signed locally; no request to the storage service
+    return s3_client().generate_presigned_url(
+        "get_object", Params={"Bucket": bucket, "Key": key}, ExpiresIn=IMAGE_URL_TTL
+    )
+
+
+# Ids are native Postgres uuids; reject malformed ones before they reach the DB
+UUID_PATTERN = r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$"
+CertificateId = Annotated[str, PathParam(pattern=UUID_PATTERN)]
+# List endpoints return newest first and page on (created_at, id); a cursor is
+# "<created_at in microseconds since the epoch>_<id>" of the last row of a page
+PageCursor = Annotated[Optional[str], Query(pattern=r"^[0-9]{1,20}_" + UUID_PATTERN[1:])]
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+PageLimit = Annotated[int, Query(ge=1, le=MAX_PAGE_SIZE)]
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(created_at: datetime, row_id: str) -> str:
+    return f"{(created_at - _EPOCH) // timedelta(microseconds=1)}_{row_id}"
+
+
+def paginate(query, model, limit: int, after: Optional[str]):
+    """Order newest first and select one page plus one row to detect a next page."""
+    if after is not None:
+        micros, row_id = after.split("_", 1)
+        created_at = _EPOCH + timedelta(microseconds=int(micros))
+        query = query.where(
+            tuple_(model.created_at, model.id)
+            < tuple_(created_at, row_id, types=[model.created_at.type, model.id.type])
+        )
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    return query.limit(limit + 1)
+
+
+def split_page(rows, limit: int):
+    """Trim the look-ahead row; the next-cursor header is set only if it existed."""
+    if len(rows) <= limit:
+        return rows, {}
+    rows = rows[:limit]
+    return rows, {NEXT_CURSOR_HEADER: encode_cursor(rows[-1].created_at, rows[-1].id)}
+
+
 class User(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     username: str
@@ -119,18 +307,24 @@ class OwnerDetails(BaseModel):
     contact_number: str
 
 
+# Bounds of the Numeric(6, 2) and Integer fitment columns; tape lengths are
+# rounded to the stored precision so responses match what was saved.
+TapeLength = Annotated[float, Field(ge=0, le=9999.99), AfterValidator(lambda v: round(v, 2))]
+PlateCount = Annotated[int, Field(ge=0, le=2**31 - 1)]
+
+
 class FitmentDetails(BaseModel):
     # Conspicuity Tapes 20MM
-    red_20mm: float = 0.0
-    white_20mm: float = 0.0
-    yellow_20mm: float = 0.0
+    red_20mm: TapeLength = 0.0
+    white_20mm: TapeLength = 0.0
+    yellow_20mm: TapeLength = 0.0
     # Conspicuity Tapes 50MM
-    red_50mm: float = 0.0
-    white_50mm: float = 0.0
-    yellow_50mm: float = 0.0
+    red_50mm: TapeLength = 0.0
+    white_50mm: TapeLength = 0.0
+    yellow_50mm: TapeLength = 0.0
     # Rear Marketing Plates
-    c3_plates: int = 0
-    c4_plates: int = 0
+    c3_plates: PlateCount = 0
+    c4_plates: PlateCount = 0
 
 
 class Certificate(BaseModel):
@@ -168,56 +362,335 @@ class CertificateUpdate(BaseModel):
     fitment_details: Optional[FitmentDetails] = None
     status: Optional[str] = None
 
+
+# Rows read back from the database were validated on write, so responses
+# are built from them without re-validating.
+def user_from_row(u: UserModel) -> User:
+    return User.model_construct(
+        id=u.id,
+        username=u.username,
+        role=u.role,
+        company_name=u.company_name,
+        contact_number=u.contact_number,
+        created_by=u.created_by,
+        created_at=u.created_at,
+    )
+
+
+def certificate_dict_from_row(r: CertificateModel, with_images: bool = True) -> dict:
+    """A certificate as a plain dict in the `Certificate` response shape.
+
+    The JSONB columns are already dicts, so they are passed straight through
+    to orjson instead of being rebuilt as nested models and dumped again.
+    """
+    return {
+        "id": r.id,
+        "certificate_no": r.certificate_no,
+        "retailer_id": r.retailer_id,
+        "dealer_name": r.dealer_name,
+        "dealer_license": r.dealer_license,
+        "vehicle_details": r.vehicle_details,
+        "owner_details": r.owner_details,
+        "fitment_details": r.fitment_details,
+        "fitment_date": r.fitment_date,
+        "images": (r.images or {}) if with_images else {},
+        "status": r.status,
+        "created_at": r.created_at,
+        "updated_at": r.updated_at,
+    }
+
+
+# Prebuilt statements for the per-request lookups. Built once at import and
+# executed with bound values, so requests skip constructing the statement and
+# always hit SQLAlchemy's compiled cache.
+USER_BY_USERNAME = select(UserModel).where(UserModel.username == bindparam("username"))
+RETAILER_IDS_BY_DISTRIBUTOR = (
+    select(RelationshipModel.retailer_id)
+    .where(RelationshipModel.distributor_id == bindparam("distributor_id"))
+    .distinct()
+)
+CERT_BY_ID = select(CertificateModel).where(
+    CertificateModel.id == bindparam("certificate_id")
+)
+CERT_WITH_IMAGES_BY_ID = CERT_BY_ID.options(undefer(CertificateModel.images))
+CERT_RETAILER_BY_ID = select(CertificateModel.retailer_id).where(
+    CertificateModel.id == bindparam("certificate_id")
+)
+CERT_RETAILER_AND_IMAGES_BY_ID = select(
+    CertificateModel.retailer_id, CertificateModel.images
+).where(CertificateModel.id == bindparam("certificate_id"))
+IMAGES_BY_CERT = select(CertificateImageModel).where(
+    CertificateImageModel.certificate_id == bindparam("certificate_id")
+)
+IMAGE_BY_CERT_AND_TYPE = IMAGES_BY_CERT.where(
+    CertificateImageModel.image_type == bindparam("image_type")
+)
+
+
+# distributor id -> ids of the retailers it manages
+_rel_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)
+
+
+async def retailer_ids_for(session: AsyncSession, distributor_id: str) -> List[str]:
+    retailer_ids = _rel_cache.get(distributor_id)
+    if retailer_ids is None:
+        result = await session.execute(
+            RETAILER_IDS_BY_DISTRIBUTOR, {"distributor_id": distributor_id}
+        )
+        retailer_ids = list(result.scalars().all())
+        _rel_cache[distributor_id] = retailer_ids
+    return retailer_ids
+
+
+def managed_retailer_ids(distributor_id: str):
+    """Subquery of the distributor's retailer ids, for use inside `IN (...)`.
+
+    List queries filter through this rather than `retailer_ids_for` so the
+    relationship lookup runs in the same statement (a semi-join on
+    `uq_distributor_retailer`) instead of a separate round trip.
+    """
+    return select(RelationshipModel.retailer_id).where(
+        RelationshipModel.distributor_id == distributor_id
+    )
+
+
+# HS256 tokens are minted and checked here directly rather than through a
+# general JWT library: the header is fixed, the keyed HMAC state is prepared
+# once and copied per token, and payloads go through orjson/pybase64.
+class InvalidTokenError(Exception):
+    """Malformed, forged or expired access token."""
+
+
+def _b64url(data: bytes) -> bytes:
+    return pybase64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+_JWT_HEADER = _b64url(orjson.dumps({"alg": ALGORITHM, "typ": "JWT"}))
+_JWT_HMAC = hmac.new(SECRET_KEY_BYTES, digestmod=hashlib.sha256)
+
+
+def _jwt_signature(signing_input: bytes) -> bytes:
+    mac = _JWT_HMAC.copy()
+    mac.update(signing_input)
+    return _b64url(mac.digest())
+
+
+def encode_token(payload: dict) -> str:
+    signing_input = _JWT_HEADER + b"." + _b64url(orjson.dumps(payload))
+    return (signing_input + b"." + _jwt_signature(signing_input)).decode("ascii")
+
+
+def decode_token(token: str) -> dict:
+    """Verify an HS256 token issued by `encode_token` and return its payload.
+
+    Only our exact header is accepted (no algorithm negotiation), the
+    signature is compared in constant time before the payload is parsed,
+    and `exp` is mandatory.
+    """
+    try:
+        raw = token.encode("ascii")
+    except UnicodeEncodeError:
+        raise InvalidTokenError("token is not ASCII")
+    signing_input, _, signature = raw.rpartition(b".")
+    header, _, body = signing_input.partition(b".")
+    if header != _JWT_HEADER or not body:
+        raise InvalidTokenError("malformed token")
+    if not hmac.compare_digest(signature, _jwt_signature(signing_input)):
+        raise InvalidTokenError("signature mismatch")
+    try:
+        payload = orjson.loads(pybase64.urlsafe_b64decode(body + b"=" * (-len(body) % 4)))
+    except ValueError:
+        raise InvalidTokenError("malformed payload")
+    exp = payload.get("exp") if isinstance(payload, dict) else None
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        raise InvalidTokenError("token expired")
+    return payload
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    to_encode.update({"exp": int(expire.timestamp())})
+    return encode_token(to_encode)
+
+
+def _token_cache_key(token: bytes) -> bytes:
+    return hashlib.blake2b(token, digest_size=16).digest()
+
+
+def cached_user_for_token(token: bytes) -> Optional[User]:
+    """The user a still-valid cached token resolved to, if any."""
+    cache_key = _token_cache_key(token)
+    cached = _jwt_cache.get(cache_key)
+    if cached is None:
+        return None
+    user, expires_at = cached
+    if expires_at > time.time():
+        return user
+    _jwt_cache.pop(cache_key, None)
+    return None
 
 
 async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
     session: AsyncSession = Depends(get_session),
 ):
+    # Cache hits were already resolved by AuthASGIMiddleware
+    user = getattr(request.state, "user", None)
+    if user is not None:
+        return user
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Not authenticated"
+        )
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM]
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except jwt.PyJWTError:
+        payload = decode_token(credentials.credentials)
+    except InvalidTokenError:
+        raise credentials_exception
+    username = payload.get("sub")
+    if not isinstance(username, str):
         raise credentials_exception
 
-    result = await session.execute(
-        select(UserModel).where(UserModel.username == username)
-    )
+    result = await session.execute(USER_BY_USERNAME, {"username": username})
     user_row = result.scalar_one_or_none()
     if user_row is None:
         raise credentials_exception
-    return User(
-        id=user_row.id,
-        username=user_row.username,
-        role=user_row.role,
-        company_name=user_row.company_name,
-        contact_number=user_row.contact_number,
-        created_by=user_row.created_by,
-        created_at=user_row.created_at,
-    )
+    user = user_from_row(user_row)
+    cache_key = _token_cache_key(credentials.credentials.encode("latin-1"))
+    _jwt_cache[cache_key] = (user, payload["exp"])
+    return user
+
+
+async def ensure_certificate_access(
+    session: AsyncSession, current_user: User, retailer_id: str
+) -> None:
+    """Raise 403 unless `current_user` may view certificates of `retailer_id`."""
+    if current_user.role == UserRole.RETAILER and retailer_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access forbidden")
+    elif current_user.role == UserRole.DISTRIBUTOR:
+        if retailer_id not in await retailer_ids_for(session, current_user.id):
+            raise HTTPException(status_code=403, detail="Access forbidden")
+
+
+async def inline_images(
+    session: AsyncSession, certificate_id: str, images: Dict[str, str]
+) -> Dict[str, str]:
+    """Resolve image references to what the detail view renders.
+
+    Object storage references become presigned URLs, `certificate_images`
+    rows become base64 payloads, and anything else (images uploaded before
+    either existed) is returned unchanged.
+    """
+    if not images:
+        return {}
+    stored = {}
+    if not all(ref.startswith(S3_REF_PREFIX) for ref in images.values()):
+        result = await session.execute(
+            IMAGES_BY_CERT, {"certificate_id": certificate_id}
+        )
+        stored = {img.id: img.data for img in result.scalars().all()}
+
+    def encode_all() -> Dict[str, str]:
+        resolved = {}
+        for image_type, ref in images.items():
+            if ref.startswith(S3_REF_PREFIX):
+                resolved[image_type] = presigned_image_url(ref)
+            elif ref in stored:
+                resolved[image_type] = pybase64.b64encode(stored[ref]).decode("ascii")
+            else:
+                resolved[image_type] = ref
+        return resolved
+
+    # Multi-MB images would otherwise stall the event loop while encoding
+    return await asyncio.to_thread(encode_all)
+
+
+# Leading bytes of the image formats browsers render, for images stored
+# before content types were recorded
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+)
+
+
+def sniff_image_type(data: bytes) -> str:
+    for magic, media_type in IMAGE_SIGNATURES:
+        if data.startswith(magic):
+            return media_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
 
 
-def require_roles(allowed_roles: List[str]):
-    def role_checker(current_user: User = Depends(get_current_user)):
-        if current_user.role not in allowed_roles:
+def decode_legacy_image(ref: str) -> Optional[tuple]:
+    """Bytes and content type of an image kept inline in `images` as base64.
+
+    Uploads from before `certificate_images` existed stored the encoded file
+    itself (optionally as a data: URL); returns None if `ref` is not one.
+    """
+    media_type = None
+    if ref.startswith("data:"):
+        header, _, ref = ref.partition(",")
+        media_type = header[len("data:"):].partition(";")[0] or None
+    try:
+        data = pybase64.b64decode(ref, validate=True)
+    except ValueError:
+        return None
+    return data, media_type or sniff_image_type(data)
+
+
+async def store_image_row(
+    session: AsyncSession,
+    certificate_id: str,
+    image_type: str,
+    content_type: str,
+    contents: bytearray,
+) -> str:
+    """Upsert the image into `certificate_images` and return the row id."""
+    stmt = pg_insert(CertificateImageModel).values(
+        id=str(uuid.uuid4()),
+        certificate_id=certificate_id,
+        image_type=image_type,
+        content_type=content_type,
+        size=len(contents),
+        # asyncpg encodes buffer objects as bytea directly; no bytes() copy
+        data=contents,
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_certificate_image_type",
+        set_={
+            "content_type": stmt.excluded.content_type,
+            "size": stmt.excluded.size,
+            "data": stmt.excluded.data,
+            "created_at": func.now(),
+        },
+    ).returning(CertificateImageModel.id)
+    return (await session.execute(stmt)).scalar_one()
+
+
+def require_roles(allowed_roles: Iterable[str]):
+    return _role_checker(frozenset(allowed_roles))
+
+
+@lru_cache(maxsize=16)
+def _role_checker(allowed: FrozenSet[str]):
+    # One callable per role set, so FastAPI sees the same dependency object
+    # wherever it is used. Async, so it runs inline on the event loop rather
+    # than being dispatched to the threadpool like a sync dependency.
+    async def role_checker(current_user: User = Depends(get_current_user)):
+        if current_user.role not in allowed:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail="Insufficient permissions"
             )
@@ -226,6 +699,11 @@ def require_roles(allowed_roles: List[str]):
     return role_checker
 
 
+# Built once so every route shares the same dependency callable
+require_retailer = require_roles([UserRole.RETAILER])
+require_admin_or_distributor = require_roles([UserRole.ADMIN, UserRole.DISTRIBUTOR])
+
+
 # Routes
 @api_router.get("/")
 async def root():
@@ -244,8 +722,12 @@ async def health_check():
         # Run a trivial select 1
         from sqlalchemy import text
 
-        async with orm_engine.begin() as conn:
-            await conn.execute(text("SELECT 1"))
+        async def probe():
+            async with orm_engine.begin() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        # A saturated pool or stuck server reports "degraded" promptly
+        await asyncio.wait_for(probe(), timeout=HEALTH_DB_TIMEOUT)
     except Exception:  # pragma: no cover
         db_ok = False
     return {"app": "ok", "db": "ok" if db_ok else "degraded"}
@@ -257,16 +739,6 @@ async def register_user(
     current_user: Optional[User] = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
-    # Check if user already exists
-    existing = await session.execute(
-        select(UserModel).where(UserModel.username == user_data.username)
-    )
-    if existing.scalar_one_or_none():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered",
-        )
-
     # Role-based registration logic
     if user_data.role == UserRole.ADMIN:
         raise HTTPException(
@@ -290,44 +762,55 @@ async def register_user(
             )
 
     # Create user
-    salt, hashed_password = hash_password(user_data.password)
+    hashed_password = await run_password_work(hash_password, user_data.password)
     user_dict = user_data.model_dump(exclude={"password"})
     user_obj = User(**user_dict)
 
     if current_user:
         user_obj.created_by = current_user.id
 
-    # Store user with hashed password
-    db_user = UserModel(
-        id=user_obj.id,
-        username=user_obj.username,
-        password_hash=hashed_password,
-        role=user_obj.role,
-        company_name=user_obj.company_name,
-        contact_number=user_obj.contact_number,
-        created_by=user_obj.created_by,
-        created_at=user_obj.created_at,
-        password_salt=salt,
+    # Store user with hashed password. ON CONFLICT on the unique username
+    # index detects duplicates in the same round trip as the insert, with no
+    # race between a check and the write and no failed transaction to undo.
+    result = await session.execute(
+        pg_insert(UserModel)
+        .values(
+            id=user_obj.id,
+            username=user_obj.username,
+            password_hash=hashed_password,
+            role=user_obj.role,
+            company_name=user_obj.company_name,
+            contact_number=user_obj.contact_number,
+            created_by=user_obj.created_by,
+        )
+        .on_conflict_do_nothing(index_elements=[UserModel.username])
+        .returning(UserModel.created_at)
     )
-    session.add(db_user)
-    try:
-        await session.commit()
-    except IntegrityError:
+    created_at = result.scalar_one_or_none()
+    if created_at is None:
         await session.rollback()
-        raise HTTPException(status_code=400, detail="Username already exists")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered",
+        )
+    user_obj.created_at = created_at
 
     # Create distributor-retailer relationship if applicable
-    if (
+    links_retailer = (
         user_data.role == UserRole.RETAILER
         and current_user
         and current_user.role == UserRole.DISTRIBUTOR
-    ):
-        rel = RelationshipModel(
-            distributor_id=current_user.id,
-            retailer_id=user_obj.id,
+    )
+    if links_retailer:
+        session.add(
+            RelationshipModel(
+                distributor_id=current_user.id,
+                retailer_id=user_obj.id,
+            )
         )
-        session.add(rel)
-        await session.commit()
+    await session.commit()
+    if links_retailer:
+        _rel_cache.pop(current_user.id, None)
 
     return user_obj
 
@@ -337,11 +820,14 @@ async def login(
     user_credentials: UserLogin, session: AsyncSession = Depends(get_session)
 ):
     result = await session.execute(
-        select(UserModel).where(UserModel.username == user_credentials.username)
+        USER_BY_USERNAME, {"username": user_credentials.username}
     )
     user_row = result.scalar_one_or_none()
-    if not user_row or not verify_password(
-        user_credentials.password, user_row.password_salt, user_row.password_hash
+    if not user_row or not await verify_password_cached(
+        user_row.username,
+        user_credentials.password,
+        user_row.password_hash,
+        user_row.password_salt,
     ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -349,20 +835,22 @@ async def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Transparently upgrade legacy PBKDF2 (or outdated Argon2) hashes
+    if needs_rehash(user_row.password_hash):
+        new_hash = await run_password_work(hash_password, user_credentials.password)
+        await session.execute(
+            update(UserModel)
+            .where(UserModel.id == user_row.id)
+            .values(password_hash=new_hash, password_salt=None)
+        )
+        await session.commit()
+
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user_row.username}, expires_delta=access_token_expires
     )
 
-    user_obj = User(
-        id=user_row.id,
-        username=user_row.username,
-        role=user_row.role,
-        company_name=user_row.company_name,
-        contact_number=user_row.contact_number,
-        created_by=user_row.created_by,
-        created_at=user_row.created_at,
-    )
+    user_obj = user_from_row(user_row)
     return {"access_token": access_token, "token_type": "bearer", "user": user_obj}
 
 
@@ -373,77 +861,50 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 @api_router.get("/users", response_model=List[User])
 async def get_users(
-    current_user: User = Depends(require_roles([UserRole.ADMIN, UserRole.DISTRIBUTOR])),
+    response: Response,
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+    after: PageCursor = None,
+    current_user: User = Depends(require_admin_or_distributor),
     session: AsyncSession = Depends(get_session),
 ):
-    if current_user.role == UserRole.ADMIN:
-        result = await session.execute(select(UserModel))
-        rows = result.scalars().all()
-    else:
-        rels = await session.execute(
-            select(RelationshipModel).where(
-                RelationshipModel.distributor_id == current_user.id
-            )
-        )
-        retailer_ids = [r.retailer_id for r in rels.scalars().all()]
-        if retailer_ids:
-            result = await session.execute(
-                select(UserModel).where(UserModel.id.in_(retailer_ids))
-            )
-            rows = result.scalars().all()
-        else:
-            rows = []
-    return [
-        User(
-            id=u.id,
-            username=u.username,
-            role=u.role,
-            company_name=u.company_name,
-            contact_number=u.contact_number,
-            created_by=u.created_by,
-            created_at=u.created_at,
-        )
-        for u in rows
-    ]
+    query = select(UserModel)
+    if current_user.role == UserRole.DISTRIBUTOR:
+        query = query.where(UserModel.id.in_(managed_retailer_ids(current_user.id)))
+
+    result = await session.execute(paginate(query, UserModel, limit, after))
+    rows, headers = split_page(result.scalars().all(), limit)
+    response.headers.update(headers)
+    return [user_from_row(u) for u in rows]
 
 
-@api_router.post("/certificates", response_model=Certificate)
+@api_router.post("/certificates", responses={200: {"model": Certificate}})
 async def create_certificate(
     cert_data: CertificateCreate,
-    current_user: User = Depends(require_roles([UserRole.RETAILER])),
+    current_user: User = Depends(require_retailer),
     session: AsyncSession = Depends(get_session),
 ):
-    cert_obj = Certificate(
+    db_cert = CertificateModel(
         retailer_id=current_user.id,
         dealer_name=cert_data.dealer_name,
         dealer_license=cert_data.dealer_license,
-        vehicle_details=cert_data.vehicle_details,
-        owner_details=cert_data.owner_details,
-        fitment_details=cert_data.fitment_details,
+        vehicle_details=cert_data.vehicle_details.model_dump(mode="json"),
+        owner_details=cert_data.owner_details.model_dump(mode="json"),
+        fitment_details=cert_data.fitment_details.model_dump(mode="json"),
+        images={},
         status=cert_data.status,
     )
-    db_cert = CertificateModel(
-        id=cert_obj.id,
-        certificate_no=cert_obj.certificate_no,
-        retailer_id=cert_obj.retailer_id,
-        dealer_name=cert_obj.dealer_name,
-        dealer_license=cert_obj.dealer_license,
-        vehicle_details=cert_obj.vehicle_details.model_dump(),
-        owner_details=cert_obj.owner_details.model_dump(),
-        fitment_details=cert_obj.fitment_details.model_dump(),
-        images=cert_obj.images,
-        status=cert_obj.status,
-        fitment_date=cert_obj.fitment_date,
-        created_at=cert_obj.created_at,
-        updated_at=cert_obj.updated_at,
-    )
     session.add(db_cert)
     await session.commit()
-    return cert_obj
+    # certificate_no and the timestamps come back from INSERT ... RETURNING
+    return AppJSONResponse(certificate_dict_from_row(db_cert))
 
 
-@api_router.get("/certificates", response_model=List[Certificate])
+@api_router.get("/certificates", responses={200: {"model": List[Certificate]}})
 async def get_certificates(
+    limit: PageLimit = DEFAULT_PAGE_SIZE,
+    after: PageCursor = None,
+    registration_no: Optional[str] = None,
+    chassis_no: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
@@ -451,262 +912,326 @@ async def get_certificates(
     if current_user.role == UserRole.ADMIN:
         pass
     elif current_user.role == UserRole.DISTRIBUTOR:
-        rels = await session.execute(
-            select(RelationshipModel).where(
-                RelationshipModel.distributor_id == current_user.id
-            )
+        query = query.where(
+            CertificateModel.retailer_id.in_(managed_retailer_ids(current_user.id))
         )
-        retailer_ids = [r.retailer_id for r in rels.scalars().all()]
-        if retailer_ids:
-            query = query.where(CertificateModel.retailer_id.in_(retailer_ids))
-        else:
-            return []
     else:
         query = query.where(CertificateModel.retailer_id == current_user.id)
-
-    result = await session.execute(query)
-    rows = result.scalars().all()
-    return [
-        Certificate(
-            id=r.id,
-            certificate_no=r.certificate_no,
-            retailer_id=r.retailer_id,
-            dealer_name=r.dealer_name,
-            dealer_license=r.dealer_license,
-            vehicle_details=VehicleDetails(**r.vehicle_details),
-            owner_details=OwnerDetails(**r.owner_details),
-            fitment_details=FitmentDetails(**r.fitment_details),
-            fitment_date=r.fitment_date,
-            images=r.images,
-            status=r.status,
-            created_at=r.created_at,
-            updated_at=r.updated_at,
+    if registration_no is not None:
+        query = query.where(
+            CertificateModel.vehicle_details["registration_no"].astext == registration_no
+        )
+    if chassis_no is not None:
+        query = query.where(
+            CertificateModel.vehicle_details.contains({"chassis_no": chassis_no})
         )
-        for r in rows
-    ]
+
+    result = await session.execute(paginate(query, CertificateModel, limit, after))
+    rows, headers = split_page(result.scalars().all(), limit)
+    return AppJSONResponse(
+        [certificate_dict_from_row(r, with_images=False) for r in rows],
+        headers=headers,
+    )
 
 
-@api_router.get("/certificates/{certificate_id}", response_model=Certificate)
+@api_router.get("/certificates/{certificate_id}", responses={200: {"model": Certificate}})
 async def get_certificate(
-    certificate_id: str,
+    certificate_id: CertificateId,
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
     result = await session.execute(
-        select(CertificateModel).where(CertificateModel.id == certificate_id)
+        CERT_WITH_IMAGES_BY_ID, {"certificate_id": certificate_id}
     )
     r = result.scalar_one_or_none()
     if not r:
         raise HTTPException(status_code=404, detail="Certificate not found")
 
-    cert_obj = Certificate(
-        id=r.id,
-        certificate_no=r.certificate_no,
-        retailer_id=r.retailer_id,
-        dealer_name=r.dealer_name,
-        dealer_license=r.dealer_license,
-        vehicle_details=VehicleDetails(**r.vehicle_details),
-        owner_details=OwnerDetails(**r.owner_details),
-        fitment_details=FitmentDetails(**r.fitment_details),
-        fitment_date=r.fitment_date,
-        images=r.images,
-        status=r.status,
-        created_at=r.created_at,
-        updated_at=r.updated_at,
-    )
+    cert = certificate_dict_from_row(r)
 
     # Check permissions
-    if (
-        current_user.role == UserRole.RETAILER
-        and cert_obj.retailer_id != current_user.id
-    ):
-        raise HTTPException(status_code=403, detail="Access forbidden")
-    elif current_user.role == UserRole.DISTRIBUTOR:
-        rel_result = await session.execute(
-            select(RelationshipModel).where(
-                RelationshipModel.distributor_id == current_user.id,
-                RelationshipModel.retailer_id == cert_obj.retailer_id,
-            )
-        )
-        if not rel_result.scalar_one_or_none():
-            raise HTTPException(status_code=403, detail="Access forbidden")
+    await ensure_certificate_access(session, current_user, r.retailer_id)
 
-    return cert_obj
+    cert["images"] = await inline_images(session, r.id, cert["images"])
+    return AppJSONResponse(cert)
 
 
-@api_router.put("/certificates/{certificate_id}", response_model=Certificate)
+@api_router.put("/certificates/{certificate_id}", responses={200: {"model": Certificate}})
 async def update_certificate(
-    certificate_id: str,
+    certificate_id: CertificateId,
     cert_data: CertificateUpdate,
-    current_user: User = Depends(require_roles([UserRole.RETAILER])),
+    current_user: User = Depends(require_retailer),
     session: AsyncSession = Depends(get_session),
 ):
-    result = await session.execute(
-        select(CertificateModel).where(CertificateModel.id == certificate_id)
+    # Only the fields the client sent (nulls mean "leave as is"); nested
+    # models come out as JSON-ready dicts. A fitment_details object replaces
+    # all quantities (omitted ones reset to 0, as when it was one JSONB
+    # value), so it is dumped in full onto its typed columns.
+    update_fields = cert_data.model_dump(
+        exclude={"fitment_details"}, exclude_unset=True, exclude_none=True, mode="json"
     )
-    r = result.scalar_one_or_none()
-    if not r:
-        raise HTTPException(status_code=404, detail="Certificate not found")
-    if r.retailer_id != current_user.id:
-        raise HTTPException(status_code=403, detail="Access forbidden")
+    if cert_data.fitment_details is not None:
+        update_fields.update(cert_data.fitment_details.model_dump())
+    update_fields["updated_at"] = func.now()
 
-    data = cert_data.dict(exclude_unset=True)
-    update_fields = {}
-    if data.get("dealer_name") is not None:
-        update_fields["dealer_name"] = data["dealer_name"]
-    if data.get("dealer_license") is not None:
-        update_fields["dealer_license"] = data["dealer_license"]
-    if data.get("vehicle_details") is not None:
-        update_fields["vehicle_details"] = data["vehicle_details"].model_dump()
-    if data.get("owner_details") is not None:
-        update_fields["owner_details"] = data["owner_details"].model_dump()
-    if data.get("fitment_details") is not None:
-        update_fields["fitment_details"] = data["fitment_details"].model_dump()
-    if data.get("status") is not None:
-        update_fields["status"] = data["status"]
-    update_fields["updated_at"] = datetime.now(timezone.utc)
-
-    await session.execute(
+    # Ownership is part of the WHERE clause and UPDATE ... RETURNING hands
+    # back the new row, so the happy path is a single round trip
+    result = await session.execute(
         update(CertificateModel)
-        .where(CertificateModel.id == certificate_id)
+        .where(
+            CertificateModel.id == certificate_id,
+            CertificateModel.retailer_id == current_user.id,
+        )
         .values(**update_fields)
+        .returning(CertificateModel, CertificateModel.images)
+        .execution_options(populate_existing=True)
     )
+    row = result.one_or_none()
+    if row is None:
+        # Nothing updated: tell a missing certificate from someone else's
+        await session.rollback()
+        result = await session.execute(
+            CERT_RETAILER_BY_ID, {"certificate_id": certificate_id}
+        )
+        if result.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="Certificate not found")
+        raise HTTPException(status_code=403, detail="Access forbidden")
+    r, images = row
     await session.commit()
-
-    # Re-fetch
-    result = await session.execute(
-        select(CertificateModel).where(CertificateModel.id == certificate_id)
-    )
-    r = result.scalar_one_or_none()
-    return Certificate(
-        id=r.id,
-        certificate_no=r.certificate_no,
-        retailer_id=r.retailer_id,
-        dealer_name=r.dealer_name,
-        dealer_license=r.dealer_license,
-        vehicle_details=VehicleDetails(**r.vehicle_details),
-        owner_details=OwnerDetails(**r.owner_details),
-        fitment_details=FitmentDetails(**r.fitment_details),
-        fitment_date=r.fitment_date,
-        images=r.images,
-        status=r.status,
-        created_at=r.created_at,
-        updated_at=r.updated_at,
-    )
+    cert = certificate_dict_from_row(r, with_images=False)
+    cert["images"] = images or {}
+    return AppJSONResponse(cert)
 
 
 @api_router.post("/certificates/{certificate_id}/upload-image")
 async def upload_certificate_image(
-    certificate_id: str,
+    certificate_id: CertificateId,
     image_type: str,  # front, back, side1, side2
     file: UploadFile = File(...),
-    current_user: User = Depends(require_roles([UserRole.RETAILER])),
+    current_user: User = Depends(require_retailer),
     session: AsyncSession = Depends(get_session),
 ):
     result = await session.execute(
-        select(CertificateModel).where(CertificateModel.id == certificate_id)
+        CERT_WITH_IMAGES_BY_ID, {"certificate_id": certificate_id}
     )
     r = result.scalar_one_or_none()
     if not r:
         raise HTTPException(status_code=404, detail="Certificate not found")
     if r.retailer_id != current_user.id:
         raise HTTPException(status_code=403, detail="Access forbidden")
-    if image_type not in ["front", "back", "side1", "side2"]:
+    if image_type not in IMAGE_TYPES:
         raise HTTPException(status_code=400, detail="Invalid image type")
 
-    contents = await file.read()
-    encoded_image = base64.b64encode(contents).decode("utf-8")
+    # UploadSizeLimitMiddleware already bounded the request body; this is the
+    # exact limit for the file part itself
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Image exceeds {MAX_IMAGE_BYTES} bytes",
+    )
+    if file.size is not None and file.size > MAX_IMAGE_BYTES:
+        raise too_large
+
+    content_type = file.content_type or "application/octet-stream"
+    if IMAGE_BUCKET:
+        # Stream the spooled upload to the bucket instead of buffering it here
+        if file.size is None and file.file.seek(0, os.SEEK_END) > MAX_IMAGE_BYTES:
+            raise too_large
+        file.file.seek(0)
+        key = f"certificates/{certificate_id}/{image_type}"
+        await asyncio.to_thread(
+            s3_client().upload_fileobj,
+            file.file,
+            IMAGE_BUCKET,
+            key,
+            ExtraArgs={"ContentType": content_type},
+        )
+        image_ref = f"{S3_REF_PREFIX}{IMAGE_BUCKET}/{key}"
+        # A copy from before the bucket was configured is now superseded
+        await session.execute(
+            delete(CertificateImageModel).where(
+                CertificateImageModel.certificate_id == certificate_id,
+                CertificateImageModel.image_type == image_type,
+            )
+        )
+    else:
+        # Read the spooled upload incrementally into a single buffer instead
+        # of materialising it (and a base64 copy) in one go; the cap is
+        # enforced while reading in case the declared size was missing
+        contents = bytearray()
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            contents += chunk
+            if len(contents) > MAX_IMAGE_BYTES:
+                raise too_large
+        image_ref = await store_image_row(
+            session, certificate_id, image_type, content_type, contents
+        )
+
     new_images = dict(r.images or {})
-    new_images[image_type] = encoded_image
+    new_images[image_type] = image_ref
 
     await session.execute(
         update(CertificateModel)
         .where(CertificateModel.id == certificate_id)
-        .values(images=new_images, updated_at=datetime.now(timezone.utc))
+        .values(images=new_images)
     )
     await session.commit()
     return {"message": "Image uploaded successfully", "image_type": image_type}
 
 
+@api_router.get("/certificates/{certificate_id}/image/{image_type}")
+async def get_certificate_image(
+    certificate_id: CertificateId,
+    image_type: str,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+):
+    result = await session.execute(
+        CERT_RETAILER_AND_IMAGES_BY_ID, {"certificate_id": certificate_id}
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    retailer_id, images = row
+    await ensure_certificate_access(session, current_user, retailer_id)
+
+    ref = (images or {}).get(image_type, "")
+    if ref.startswith(S3_REF_PREFIX):
+        return RedirectResponse(presigned_image_url(ref), status_code=302)
+
+    result = await session.execute(
+        IMAGE_BY_CERT_AND_TYPE,
+        {"certificate_id": certificate_id, "image_type": image_type},
+    )
+    img = result.scalar_one_or_none()
+    if img is not None:
+        return Response(content=img.data, media_type=img.content_type)
+
+    # Not migrated to certificate_images: the reference is the image itself
+    legacy = await asyncio.to_thread(decode_legacy_image, ref) if ref else None
+    if legacy is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    data, media_type = legacy
+    return Response(content=data, media_type=media_type)
+
+
 @api_router.get("/dashboard/stats")
 async def get_dashboard_stats(
     current_user: User = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
 ):
+    # Certificate counts for the rows in scope, aggregated in the database.
+    # Draft is counted, not derived: status is free-form, so total minus
+    # submitted would also count any other status as draft.
+    cert_counts = select(
+        func.count().label("total_certificates"),
+        func.count()
+        .filter(CertificateModel.status == "submitted")
+        .label("submitted_certificates"),
+        func.count()
+        .filter(CertificateModel.status == "draft")
+        .label("draft_certificates"),
+    ).select_from(CertificateModel)
+
     if current_user.role == UserRole.ADMIN:
-        total_users = (await session.execute(func.count(UserModel.id))).scalar() or 0
-        total_distributors = (
-            await session.execute(
-                func.count(UserModel.id).filter(UserModel.role == UserRole.DISTRIBUTOR)
-            )
-        ).scalar() or 0
-        total_retailers = (
-            await session.execute(
-                func.count(UserModel.id).filter(UserModel.role == UserRole.RETAILER)
-            )
-        ).scalar() or 0
-        total_certificates = (
-            await session.execute(func.count(CertificateModel.id))
-        ).scalar() or 0
-        submitted_certificates = (
-            await session.execute(
-                func.count(CertificateModel.id).filter(
-                    CertificateModel.status == "submitted"
-                )
+        # Both tables aggregated in one statement: one round trip, one pass each
+        user_counts = (
+            select(
+                func.count().label("total_users"),
+                func.count()
+                .filter(UserModel.role == UserRole.DISTRIBUTOR)
+                .label("total_distributors"),
+                func.count()
+                .filter(UserModel.role == UserRole.RETAILER)
+                .label("total_retailers"),
             )
-        ).scalar() or 0
-        return {
-            "total_users": total_users,
-            "total_distributors": total_distributors,
-            "total_retailers": total_retailers,
-            "total_certificates": total_certificates,
-            "submitted_certificates": submitted_certificates,
-            "draft_certificates": total_certificates - submitted_certificates,
-        }
+            .select_from(UserModel)
+            .subquery()
+        )
+        all_certs = cert_counts.subquery()
+        stmt = select(user_counts, all_certs).select_from(
+            user_counts.join(all_certs, true())
+        )
     elif current_user.role == UserRole.DISTRIBUTOR:
-        rels = await session.execute(
-            select(RelationshipModel).where(
-                RelationshipModel.distributor_id == current_user.id
-            )
+        # Retailer count rides along in the same statement
+        total_retailers = (
+            select(func.count())
+            .select_from(RelationshipModel)
+            .where(RelationshipModel.distributor_id == current_user.id)
+            .scalar_subquery()
         )
-        retailer_ids = [r.retailer_id for r in rels.scalars().all()]
-        total_retailers = len(retailer_ids)
-        if retailer_ids:
-            certs_result = await session.execute(
-                select(CertificateModel).where(
-                    CertificateModel.retailer_id.in_(retailer_ids)
-                )
-            )
-            rows = certs_result.scalars().all()
-        else:
-            rows = []
-        total_certificates = len(rows)
-        submitted_certificates = len([r for r in rows if r.status == "submitted"])
-        return {
-            "total_retailers": total_retailers,
-            "total_certificates": total_certificates,
-            "submitted_certificates": submitted_certificates,
-            "draft_certificates": total_certificates - submitted_certificates,
-        }
-    else:
-        certs_result = await session.execute(
-            select(CertificateModel).where(
-                CertificateModel.retailer_id == current_user.id
-            )
+        stmt = cert_counts.add_columns(
+            total_retailers.label("total_retailers")
+        ).where(
+            CertificateModel.retailer_id.in_(managed_retailer_ids(current_user.id))
         )
-        rows = certs_result.scalars().all()
-        total_certificates = len(rows)
-        submitted_certificates = len([r for r in rows if r.status == "submitted"])
-        return {
-            "total_certificates": total_certificates,
-            "submitted_certificates": submitted_certificates,
-            "draft_certificates": total_certificates - submitted_certificates,
-        }
+    else:
+        stmt = cert_counts.where(CertificateModel.retailer_id == current_user.id)
+    row = (await session.execute(stmt)).one()
+    return dict(row._mapping)
 
 
 # Include the router in the main app
 app.include_router(api_router)
 
+
+class UploadSizeLimitMiddleware:
+    """Rejects oversized image uploads before their body is parsed.
+
+    Starlette spools the whole multipart body to a temporary file before the
+    endpoint (and its dependencies) run, so the endpoint's own size check
+    comes too late to save the read. Here a declared `content-length` above
+    the cap gets a 413 without reading any body, and the bytes actually
+    received are counted so a chunked or understated body is cut off once it
+    passes the cap.
+    """
+
+    def __init__(self, app, max_body: int):
+        self.app = app
+        self.max_body = max_body
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or not scope["path"].endswith("/upload-image")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        too_large = HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Image exceeds {MAX_IMAGE_BYTES} bytes",
+        )
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if not value.isdigit() or int(value) > self.max_body:
+                    response = AppJSONResponse(
+                        {"detail": too_large.detail}, status_code=too_large.status_code
+                    )
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def receive_limited():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    # Raised inside form parsing; FastAPI passes HTTPExceptions
+                    # through to the exception handler, which renders the 413
+                    raise too_large
+            return message
+
+        await self.app(scope, receive_limited, send)
+
+
+# Registered before CORS so it runs inside it and its 413s carry CORS headers;
+# the allowance covers multipart boundaries and part headers
+app.add_middleware(UploadSizeLimitMiddleware, max_body=MAX_IMAGE_BYTES + 64 * 1024)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -714,8 +1239,73 @@ app.add_middleware(
     allow_origins=os.environ.get("CORS_ORIGINS", "*").split(","),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+# Compress JSON bodies (certificate lists, inlined images) when the client
+# accepts gzip; tiny responses are not worth the CPU
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+
+class ServerTimingMiddleware:
+    """Adds `Server-Timing: app;dur=<ms>` to every HTTP response.
+
+    Plain ASGI (like Starlette's CORS and GZip middleware) rather than
+    `BaseHTTPMiddleware`, so no extra task or Request/Response objects are
+    created per request; the header is injected as the response starts.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", b"app;dur=%.1f" % elapsed_ms))
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
+
+
+class AuthASGIMiddleware:
+    """Resolves cached bearer tokens once per request, before routing.
+
+    Reads the raw `authorization` header from the ASGI scope and, on a token
+    cache hit, stores the user in `scope["state"]["user"]` where
+    `get_current_user` picks it up without decoding anything. Misses (and
+    missing or malformed headers) pass through untouched; the dependency
+    verifies those and fills the cache.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            for name, value in scope["headers"]:
+                if name == b"authorization":
+                    scheme, _, token = value.partition(b" ")
+                    if token and scheme.lower() == b"bearer":
+                        user = cached_user_for_token(token)
+                        if user is not None:
+                            scope.setdefault("state", {})["user"] = user
+                    break
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(AuthASGIMiddleware)
+
+# Outermost, so the figure covers CORS and compression as well
+app.add_middleware(ServerTimingMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -729,32 +1319,68 @@ logger = logging.getLogger("vehicle_conspicuity_api")
 # Create default admin user on startup
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables
-    async with orm_engine.begin() as conn:
-        await conn.run_sync(ORMBase.metadata.create_all)
+    # Fail fast when launched without `--loop uvloop`
+    loop_module = type(asyncio.get_running_loop()).__module__
+    if not loop_module.startswith("uvloop"):
+        if REQUIRE_UVLOOP:
+            raise RuntimeError(
+                "uvloop event loop required; start uvicorn with --loop uvloop --http httptools"
+            )
+        logger.warning("Running on %s event loop; uvloop is recommended", loop_module)
+
+    # Create tables and any indexes missing from existing tables
+    await ensure_schema()
+
+    # Establish pooled connections before traffic arrives
+    await warm_pool()
 
-    # Create default admin if none exists
+    init_s3_client()
+
+    # Create default admin if no admin exists (keyed on role, so renaming the
+    # admin does not bring admin/admin123 back). The EXISTS probe keeps the
+    # password hash off the normal boot path; the conflict-ignoring insert
+    # covers a non-admin already holding the "admin" username, or a
+    # concurrent worker seeding at the same time.
     async with AsyncSessionLocal() as session:  # type: ignore
-        result = await session.execute(
-            select(UserModel).where(UserModel.role == UserRole.ADMIN)
+        admin_exists = await session.scalar(
+            select(exists().where(UserModel.role == UserRole.ADMIN))
         )
-        admin_exists = result.scalar_one_or_none()
         if not admin_exists:
-            session.add(
-                UserModel(
+            result = await session.execute(
+                pg_insert(UserModel)
+                .values(
                     id=str(uuid.uuid4()),
                     username="admin",
-                    password_hash=hash_password("admin123"),
+                    password_hash=await run_password_work(hash_password, "admin123"),
                     role=UserRole.ADMIN,
                     company_name="System Admin",
                 )
+                .on_conflict_do_nothing(index_elements=[UserModel.username])
+                .returning(UserModel.id)
             )
+            created = result.scalar_one_or_none() is not None
             await session.commit()
-            logger.info("Default admin user created: username=admin, password=admin123")
-    logger.info("Startup tasks completed (tables ensured, admin checked)")
+            if created:
+                logger.warning(
+                    "Default admin user created: username=admin, password=admin123; change it"
+                )
+            else:
+                logger.warning(
+                    "No admin user exists and the username 'admin' is taken; default admin not created"
+                )
+    logger.info("Startup tasks completed (tables and indexes ensured, admin checked)")
     yield
-    # (Optional) graceful shutdown tasks here
+    # Pooled connections belong to this event loop; a later startup opens new ones
+    await orm_engine.dispose()
 
 
 # Recreate app with lifespan so startup logic executes (rebind routers & middleware already added above if needed)
 app.router.lifespan_context = lifespan
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # loop/http "auto" pick uvloop and httptools whenever they are installed
+    # (everywhere but Windows), falling back to asyncio and h11
+    uvicorn.run(app, host="0.0.0.0", port=8000, loop="auto", http="auto")
@@ -0,0 +1,149 @@
+"""Unit tests for the hand-rolled HS256 tokens in server.py (no database needed)."""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+import pytest
+
+from server import SECRET_KEY_BYTES, InvalidTokenError, decode_token, encode_token
+
+
+def b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def compact_json(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def forge(header: dict, payload: dict, key: bytes = SECRET_KEY_BYTES) -> str:
+    """Build a token with an arbitrary header, signed like a standard HS256 JWT."""
+    signing_input = f"{b64url(compact_json(header))}.{b64url(compact_json(payload))}"
+    signature = hmac.new(key, signing_input.encode("ascii"), hashlib.sha256).digest()
+    return f"{signing_input}.{b64url(signature)}"
+
+
+def future_exp() -> int:
+    return int(time.time()) + 300
+
+
+def test_round_trip():
+    payload = {"sub": "retailer1", "exp": future_exp()}
+    assert decode_token(encode_token(payload)) == payload
+
+
+def test_round_trip_non_ascii_claims():
+    payload = {"sub": "रिटेलर", "company": "Zoë & Co", "exp": future_exp()}
+    assert decode_token(encode_token(payload)) == payload
+
+
+def test_token_is_a_standard_hs256_jwt():
+    payload = {"sub": "admin", "exp": future_exp()}
+    assert encode_token(payload) == forge({"alg": "HS256", "typ": "JWT"}, payload)
+
+
+def test_bad_signature_rejected():
+    token = encode_token({"sub": "admin", "exp": future_exp()})
+    signing_input, _, signature = token.rpartition(".")
+    tampered = signature[:-2] + ("AA" if signature[-2:] != "AA" else "BB")
+    with pytest.raises(InvalidTokenError):
+        decode_token(f"{signing_input}.{tampered}")
+
+
+def test_wrong_key_rejected():
+    with pytest.raises(InvalidTokenError):
+        decode_token(forge({"alg": "HS256", "typ": "JWT"}, {"sub": "admin", "exp": future_exp()}, b"other"))
+
+
+def test_tampered_payload_rejected():
+    token = encode_token({"sub": "retailer1", "exp": future_exp()})
+    header, _, signature = token.split(".")
+    body = b64url(json.dumps({"sub": "admin", "exp": future_exp()}).encode())
+    with pytest.raises(InvalidTokenError):
+        decode_token(f"{header}.{body}.{signature}")
+
+
+def test_expired_rejected():
+    with pytest.raises(InvalidTokenError):
+        decode_token(encode_token({"sub": "admin", "exp": int(time.time()) - 1}))
+
+
+@pytest.mark.parametrize("exp", [None, "9999999999", [9999999999]])
+def test_missing_or_non_numeric_exp_rejected(exp):
+    payload = {"sub": "admin"} if exp is None else {"sub": "admin", "exp": exp}
+    with pytest.raises(InvalidTokenError):
+        decode_token(encode_token(payload))
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        {"alg": "none", "typ": "JWT"},
+        {"alg": "HS512", "typ": "JWT"},
+        {"alg": "RS256", "typ": "JWT"},
+        {"alg": "HS256"},
+        {"typ": "JWT", "alg": "HS256"},
+        {"alg": "HS256", "typ": "JWT", "kid": "1"},
+    ],
+)
+def test_other_headers_rejected_even_when_signed(header):
+    with pytest.raises(InvalidTokenError):
+        decode_token(forge(header, {"sub": "admin", "exp": future_exp()}))
+
+
+def test_alg_none_unsigned_rejected():
+    signing_input = (
+        f"{b64url(json.dumps({'alg': 'none', 'typ': 'JWT'}).encode())}."
+        f"{b64url(json.dumps({'sub': 'admin', 'exp': future_exp()}).encode())}"
+    )
+    for token in (signing_input + ".", signing_input):
+        with pytest.raises(InvalidTokenError):
+            decode_token(token)
+
+
+@pytest.mark.parametrize(
+    "token",
+    ["", ".", "..", "...", "abc", "a.b", "a.b.c", "a.b.c.d", "a.b.c\x00", "Bearer x.y.z"],
+)
+def test_malformed_segments_rejected(token):
+    with pytest.raises(InvalidTokenError):
+        decode_token(token)
+
+
+def test_extra_or_missing_segments_on_valid_token_rejected():
+    token = encode_token({"sub": "admin", "exp": future_exp()})
+    header, body, signature = token.split(".")
+    for variant in (f"{header}..{signature}", f"{header}.{body}", f"{token}.{signature}", f".{body}.{signature}"):
+        with pytest.raises(InvalidTokenError):
+            decode_token(variant)
+
+
+def test_signed_non_json_payload_rejected():
+    header = b64url(compact_json({"alg": "HS256", "typ": "JWT"}))
+    signing_input = f"{header}.{b64url(b'not json')}"
+    signature = hmac.new(SECRET_KEY_BYTES, signing_input.encode(), hashlib.sha256).digest()
+    with pytest.raises(InvalidTokenError):
+        decode_token(f"{signing_input}.{b64url(signature)}")
+
+
+def test_signed_non_object_payload_rejected():
+    header = b64url(compact_json({"alg": "HS256", "typ": "JWT"}))
+    signing_input = f"{header}.{b64url(b'[1, 2, 3]')}"
+    signature = hmac.new(SECRET_KEY_BYTES, signing_input.encode(), hashlib.sha256).digest()
+    with pytest.raises(InvalidTokenError):
+        decode_token(f"{signing_input}.{b64url(signature)}")
+
+
+@pytest.mark.parametrize("token", ["é.é.é", "eyJé.x.y", "☃"])
+def test_non_ascii_token_rejected(token):
+    with pytest.raises(InvalidTokenError):
+        decode_token(token)
+
+
+def test_valid_token_with_non_ascii_suffix_rejected():
+    token = encode_token({"sub": "admin", "exp": future_exp()})
+    with pytest.raises(InvalidTokenError):
+        decode_token(token + "é")
@@ -0,0 +1,111 @@
+"""Tests for database.bulk_insert_certificates against a real Postgres.
+
+Uses the database from POSTGRES_URL / DATABASE_URL and is skipped when it
+cannot be reached. Each test adds its own retailer and deletes it (and, by
+cascade, its certificates) afterwards.
+"""
+
+import uuid
+
+import pytest
+from sqlalchemy import delete, func, select
+
+import database
+from database import (
+    AsyncSessionLocal,
+    CertificateModel,
+    UserModel,
+    bulk_insert_certificates,
+    engine,
+    ensure_schema,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def copy_path(monkeypatch):
+    # Exercise the COPY branch without generating 10k rows
+    monkeypatch.setattr(database, "BULK_COPY_THRESHOLD", 2)
+
+
+@pytest.fixture
+async def retailer():
+    try:
+        await ensure_schema()
+    except OSError as exc:
+        await engine.dispose()
+        pytest.skip(f"Postgres not reachable: {exc}")
+    user = UserModel(
+        id=str(uuid.uuid4()),
+        username=f"bulk-{uuid.uuid4().hex[:12]}",
+        password_hash="unused",
+        role="retailer",
+    )
+    yield user
+    async with AsyncSessionLocal() as session:
+        await session.execute(delete(UserModel).where(UserModel.id == user.id))
+        await session.commit()
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
+
+
+def certificate_rows(retailer_id: str, count: int) -> list[dict]:
+    return [
+        {
+            "retailer_id": retailer_id,
+            "dealer_name": "Bulk Dealer",
+            "dealer_license": "LIC",
+            "vehicle_details": {"registration_no": f"KA01BULK{i}", "chassis_no": "CH", "note": "ü"},
+            "owner_details": {"owner_name": "Owner", "contact_number": "1"},
+            "fitment_details": {"red_20mm": 1.25, "c3_plates": 2},
+        }
+        for i in range(count)
+    ]
+
+
+async def certificate_count(retailer_id: str) -> int:
+    async with AsyncSessionLocal() as session:
+        return await session.scalar(
+            select(func.count()).where(CertificateModel.retailer_id == retailer_id)
+        )
+
+
+async def test_copy_sees_and_commits_with_the_session_transaction(retailer):
+    async with AsyncSessionLocal() as session:
+        # Flushed but uncommitted: the COPY's foreign keys only resolve if it
+        # runs in the same transaction
+        session.add(retailer)
+        await session.flush()
+        assert await bulk_insert_certificates(session, certificate_rows(retailer.id, 3)) == 3
+
+    assert await certificate_count(retailer.id) == 3
+    async with AsyncSessionLocal() as session:
+        row = (
+            await session.execute(
+                select(CertificateModel).where(CertificateModel.retailer_id == retailer.id).limit(1)
+            )
+        ).scalar_one()
+    assert row.vehicle_details["note"] == "ü"
+    assert row.fitment_details["red_20mm"] == 1.25
+    assert row.certificate_no.startswith("CERT")
+
+
+async def test_failed_copy_rolls_back_the_whole_session(retailer):
+    rows = certificate_rows(retailer.id, 3)
+    rows[-1]["retailer_id"] = str(uuid.uuid4())  # violates the users foreign key
+    async with AsyncSessionLocal() as session:
+        session.add(retailer)
+        await session.flush()
+        with pytest.raises(Exception, match="foreign key"):
+            await bulk_insert_certificates(session, rows)
+        await session.rollback()
+
+    assert await certificate_count(retailer.id) == 0
+    async with AsyncSessionLocal() as session:
+        assert await session.get(UserModel, retailer.id) is None